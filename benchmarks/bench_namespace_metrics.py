@@ -0,0 +1,89 @@
+"""Micro-benchmark comparing per-namespace scanning of Prometheus result vectors with
+the namespace-indexed extraction used by PrometheusNamespaceMetrics
+
+Run with: python benchmarks/bench_namespace_metrics.py
+"""
+import sys
+import time
+sys.path.append('.')
+from firelink.metrics import PrometheusNamespaceMetrics
+
+SIZES = (50, 500, 5000)
+QUERY_NAMES = ('cpu_limits', 'cpu_requests', 'cpu_usage', 'memory_limits', 'memory_requests', 'memory_usage')
+
+def make_results(size):
+    """Build synthetic result vectors for the six namespace queries"""
+    namespaces = [f"ephemeral-{i:06d}" for i in range(size)]
+    results = {
+        name: [{"metric": {"namespace": ns}, "value": [0, str(float(i + offset))]}
+               for i, ns in enumerate(namespaces)]
+        for offset, name in enumerate(QUERY_NAMES)
+    }
+    return namespaces, results
+
+def scan_cpu_value(query_result, namespace):
+    """The original linear scan from _extract_cpu_value"""
+    for result in query_result:
+        if result["metric"]["namespace"] == namespace:
+            raw_value = float(result["value"][1])
+            if 'm' in result["value"][1]:
+                return raw_value / 1000
+            return raw_value
+    return 0.0
+
+def scan_memory_value(query_result, namespace):
+    """The original linear scan from _extract_memory_value"""
+    for result in query_result:
+        if result["metric"]["namespace"] == namespace:
+            return float(result["value"][1]) / (1024**2)
+    return 0.0
+
+def scanning_extraction(namespaces, results):
+    """Build every namespace's resources by scanning each vector per namespace"""
+    return {
+        namespace: {
+            'limits': {
+                'cpu': scan_cpu_value(results['cpu_limits'], namespace),
+                'memory': scan_memory_value(results['memory_limits'], namespace)
+            },
+            'requests': {
+                'cpu': scan_cpu_value(results['cpu_requests'], namespace),
+                'memory': scan_memory_value(results['memory_requests'], namespace)
+            },
+            'usage': {
+                'cpu': scan_cpu_value(results['cpu_usage'], namespace),
+                'memory': scan_memory_value(results['memory_usage'], namespace)
+            }
+        }
+        for namespace in namespaces
+    }
+
+def indexed_extraction(metrics, namespaces, results):
+    """Build every namespace's resources from namespace-indexed values"""
+    values = metrics._index_results(results)
+    return {namespace: metrics._build_resources(values, namespace) for namespace in namespaces}
+
+def best_of(func, repeat):
+    """Best wall-clock time of several runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    """Print a comparison table for each vector size"""
+    metrics = PrometheusNamespaceMetrics.__new__(PrometheusNamespaceMetrics)
+    print(f"{'namespaces':>10} {'scanning (ms)':>15} {'indexed (ms)':>14} {'speedup':>9}")
+    for size in SIZES:
+        namespaces, results = make_results(size)
+        assert scanning_extraction(namespaces, results) == indexed_extraction(metrics, namespaces, results)
+        # The quadratic scan gets expensive quickly, so repeat it less at large sizes
+        repeat = 3 if size < 5000 else 1
+        old = best_of(lambda: scanning_extraction(namespaces, results), repeat)
+        new = best_of(lambda: indexed_extraction(metrics, namespaces, results), 3)
+        print(f"{size:>10} {old * 1000:>15.3f} {new * 1000:>14.3f} {old / new:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
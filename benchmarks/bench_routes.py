@@ -0,0 +1,195 @@
+"""Offline benchmark of the /api/firelink/* routes against local fakes of the Kubernetes API,
+Prometheus and bonfire (see benchmarks/fakes.py)
+
+Each fixture size runs in its own process so the informer and caches start
+cold. Latency percentiles and throughput are printed per route and the full
+results are saved as JSON so runs can be compared.
+
+Run with: python benchmarks/bench_routes.py [--sizes 100,1000] [--requests 200] [--output results.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('.')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = "100,1000"
+DEFAULT_REQUESTS = 200
+DEFAULT_OUTPUT_DIR = os.path.join("benchmarks", "results")
+
+def routes(size):
+    """(name, method, path, json body) for every read route, using names that exist at this size"""
+    from fakes import reserved_namespace_names
+    namespace = reserved_namespace_names(size)[0]
+    template_request = {
+        "namespace": namespace, "app_names": ["app-000"], "source": "appsre", "get_dependencies": True,
+        "optional_deps_method": "hybrid", "local_config_method": "merge", "set_image_tag": {},
+        "ref_env": None, "fallback_ref_env": "", "target_env": "insights-ephemeral",
+        "set_template_ref": {}, "set_parameter": {}, "local_config_path": None,
+        "single_replicas": True, "component_filter": [], "local": True, "frontends": False,
+        "preferred_params": {},
+    }
+    return [
+        ("cluster_top_nodes", "GET", "/api/firelink/cluster/top_nodes", None),
+        ("cluster_cpu_usage", "GET", "/api/firelink/cluster/cpu_usage", None),
+        ("cluster_memory_usage", "GET", "/api/firelink/cluster/memory_usage", None),
+        ("namespace_list", "GET", "/api/firelink/namespace/list", None),
+        ("namespace_resource_metrics", "GET", "/api/firelink/namespace/resource_metrics", None),
+        ("namespace_resource_metrics_combined", "GET",
+            "/api/firelink/namespace/resource_metrics?combined=true", None),
+        ("namespace_resource_metrics_single", "GET",
+            f"/api/firelink/namespace/resource_metrics/{namespace}", None),
+        ("namespace_top_pods", "POST", "/api/firelink/namespace/top_pods", {"namespace": namespace}),
+        ("namespace_describe", "GET", f"/api/firelink/namespace/describe/{namespace}", None),
+        ("apps_list", "GET", "/api/firelink/apps/list", None),
+        ("get_template", "POST", "/api/firelink/get_template", template_request),
+    ]
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, elapsed, errors):
+    """Latency percentiles in milliseconds and throughput for one route"""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+def measure_route(app, method, path, body, requests, concurrency):
+    """Send requests to one route from concurrency threads, returning its summary"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            duration = time.perf_counter() - start
+            with lock:
+                latencies.append(duration)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, shares))
+    return summarize(latencies, time.perf_counter() - start, len(errors))
+
+def run_size(size, requests, concurrency, with_cache, bonfire_latency):
+    """Benchmark every route against fakes of the given size in this process"""
+    from fakes import FakeKubernetesAPI, FakePrometheusAPI, write_kubeconfig, stub_bonfire
+    kubernetes_api = FakeKubernetesAPI(size).start()
+    prometheus_api = FakePrometheusAPI(size).start()
+    workdir = tempfile.mkdtemp(prefix="firelink-bench-")
+    kubeconfig = os.path.join(workdir, "kubeconfig")
+    write_kubeconfig(kubeconfig, kubernetes_api.url)
+    os.environ.update({
+        "KUBECONFIG": kubeconfig,
+        "PROMETHEUS_URL": prometheus_api.url,
+        "QONTRACT_BASE_URL": f"{prometheus_api.url}/graphql",
+        "HEALTH_REQUIRED_CHECKS": "kubernetes",
+    })
+    os.environ.pop("OC_TOKEN", None)
+    if not with_cache:
+        for name in ("CLUSTER_TOP_NODES", "CLUSTER_CPU_USAGE", "CLUSTER_MEMORY_USAGE", "NAMESPACE_LIST",
+                "NAMESPACE_RESOURCE_METRICS", "NAMESPACE_TOP_PODS"):
+            os.environ[f"CACHE_TTL_{name}"] = "0"
+        os.environ["TEMPLATE_CACHE_TTL"] = "0"
+    stub_bonfire(size, latency=bonfire_latency)
+
+    import server
+    from firelink.namespace_informer import get_namespace_informer
+    informer = get_namespace_informer()
+    if informer is not None and not informer.wait_for_sync(60):
+        raise RuntimeError("Namespace informer did not sync against the fake API server")
+
+    results = {}
+    for name, method, path, body in routes(size):
+        # Warm up connection pools and the apps list snapshot
+        measure_route(server.app, method, path, body, min(requests, 5), 1)
+        results[name] = measure_route(server.app, method, path, body, requests, concurrency)
+    results["_backend_requests"] = {"kubernetes": kubernetes_api.requests, "prometheus": prometheus_api.requests}
+    kubernetes_api.stop()
+    prometheus_api.stop()
+    return results
+
+def print_table(size, results):
+    """Print one size's results"""
+    print(f"\n{size} namespaces")
+    print(f"{'route':<38} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'req/s':>9} {'errors':>7}")
+    for name, summary in results.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:<38} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} "
+              f"{summary['throughput_rps']:>9.1f} {summary['errors']:>7}")
+
+def parse_args():
+    """Command line options"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated namespace counts")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads sending requests")
+    parser.add_argument("--with-cache", action="store_true", help="keep the response and template caches on")
+    parser.add_argument("--bonfire-latency", type=float, default=0.0,
+        help="seconds added to every stubbed bonfire call")
+    parser.add_argument("--output", help="JSON results file, defaults to benchmarks/results/routes-<time>.json")
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    """Run every size in a fresh process, then print and save the results"""
+    args = parse_args()
+    options = ["--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        "--bonfire-latency", str(args.bonfire_latency)] + (["--with-cache"] if args.with_cache else [])
+    if args.single_size is not None:
+        results = run_size(args.single_size, args.requests, args.concurrency, args.with_cache, args.bonfire_latency)
+        # The parent reads the last line of output
+        sys.stdout.flush()
+        print("\n" + json.dumps(results))
+        sys.stdout.flush()
+        os._exit(0)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "options": {"requests": args.requests, "concurrency": args.concurrency,
+            "with_cache": args.with_cache, "bonfire_latency": args.bonfire_latency},
+        "sizes": {},
+    }
+    for size in [int(size) for size in args.sizes.split(",")]:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single-size", str(size)] + options,
+            check=True, capture_output=True, text=True).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        report["sizes"][str(size)] = results
+        print_table(size, results)
+
+    output_path = args.output or os.path.join(
+        DEFAULT_OUTPUT_DIR, f"routes-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""Load test of the Socket.IO deploy streams against a single gunicorn gevent worker
+
+firelink is started the way the Dockerfile runs it, under
+`gunicorn -k gevent -w 1`. The Kubernetes API and Prometheus are faked (see
+benchmarks/fakes.py) and Apps.deploy is replaced by a stub that emits a fixed
+number of progress events. Each stage starts a fresh server, connects N
+Socket.IO clients on /api/firelink/socket.io, has every client fire a
+deploy-app and waits for all of them to see end-deploy-app.
+
+Per stage it reports connect latency, event fan-out latency (server emit to
+client receive), server memory per connection and whether the stage was
+sustained: every client connected, every deploy finished and p99 fan-out
+latency stayed under --max-latency-ms. Stages stop after the first one that
+isn't sustained, so the last sustained stage is the sizing figure for one
+worker.
+
+Run with: python benchmarks/bench_socketio.py [--sessions 50,100,200] [--events 10] [--output results.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('.')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SESSIONS = "50,100,200"
+DEFAULT_EVENTS = 10
+DEFAULT_EVENT_INTERVAL = 0.05
+DEFAULT_MAX_LATENCY_MS = 250
+DEFAULT_WORKER_CONNECTIONS = 1000
+DEFAULT_TIMEOUT = 60
+DEFAULT_OUTPUT_DIR = os.path.join("benchmarks", "results")
+SOCKETIO_PATH = "/api/firelink/socket.io"
+STATUS_PATH = "/bench/status"
+FIXTURE_SIZE = 10
+
+def create_app():
+    """gunicorn app factory: firelink with bonfire and Apps.deploy stubbed out"""
+    from fakes import stub_bonfire
+    from firelink.apps import Apps
+    stub_bonfire(FIXTURE_SIZE)
+    events = int(os.environ["BENCH_DEPLOY_EVENTS"])
+    interval = float(os.environ["BENCH_EVENT_INTERVAL"])
+
+    def deploy(self, deploy_request):
+        for i in range(events):
+            time.sleep(interval)
+            self.emit(self.DEPLOY_MONITOR_EVENT, {'message': f"Step {i + 1} of {events}",
+                'completed': False, 'error': False, 'sent_at': time.time()})
+        self.emit(self.DEPLOY_END_EVENT, {'message': "Deployment complete",
+            'completed': True, 'error': False, 'sent_at': time.time()})
+
+    Apps.deploy = deploy
+
+    import server
+    from firelink.instrumentation import SOCKETIO_CONNECTIONS
+
+    def status():
+        return {"rss_bytes": rss_bytes(os.getpid()), "connections": SOCKETIO_CONNECTIONS.labels().value}
+
+    server.app.add_url_rule(STATUS_PATH, "bench_status", status)
+    return server.app
+
+def rss_bytes(pid):
+    """Resident set size of a process, read from /proc"""
+    with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def free_port():
+    """A local TCP port that is free right now"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies):
+    """Latency percentiles in milliseconds"""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+class Server:
+    """firelink under one gunicorn gevent worker, backed by the local fakes"""
+    def __init__(self, backends, sessions, args):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, **backends)
+        env.update({
+            "PYTHONPATH": os.pathsep.join([os.getcwd(), os.path.dirname(os.path.abspath(__file__))]),
+            "BENCH_DEPLOY_EVENTS": str(args.events),
+            "BENCH_EVENT_INTERVAL": str(args.event_interval),
+            "DEPLOY_WORKERS": str(sessions),
+            "DEPLOY_MAX_QUEUED": str(sessions),
+            "HEALTH_REQUIRED_CHECKS": "kubernetes",
+        })
+        env.pop("OC_TOKEN", None)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-k", "gevent", "-w", "1",
+             "--worker-connections", str(args.worker_connections), "--graceful-timeout", "5",
+             "--log-level", "warning", "-b", f"127.0.0.1:{self.port}", "bench_socketio:create_app()"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def wait_until_ready(self, timeout):
+        """Block until the worker answers HTTP requests"""
+        import requests
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {self.process.returncode}")
+            try:
+                requests.get(self.url + STATUS_PATH, timeout=1).raise_for_status()
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError("gunicorn did not start serving in time")
+
+    def status(self):
+        """Worker memory and Socket.IO connection count"""
+        import requests
+        return requests.get(self.url + STATUS_PATH, timeout=10).json()
+
+    def stop(self):
+        """Shut the server down"""
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+class Session:
+    """One Socket.IO client that fires a deploy and records when its events arrive"""
+    def __init__(self, index):
+        import socketio
+        self.index = index
+        self.client = socketio.Client(reconnection=False)
+        self.latencies = []
+        self.ended = threading.Event()
+        self.errors = []
+        self.client.on("monitor-deploy-app", self._on_event)
+        self.client.on("end-deploy-app", self._on_end)
+        self.client.on("error-deploy-app", self._on_error)
+
+    def _on_event(self, data):
+        received_at = time.time()
+        if "sent_at" in data:
+            self.latencies.append(received_at - data["sent_at"])
+
+    def _on_end(self, data):
+        self._on_event(data)
+        self.ended.set()
+
+    def _on_error(self, data):
+        self.errors.append(data.get("message", ""))
+        self.ended.set()
+
+    def connect(self, url, timeout):
+        """Open the socket, returning the seconds it took"""
+        start = time.perf_counter()
+        self.client.connect(url, socketio_path=SOCKETIO_PATH, transports=["websocket"], wait_timeout=timeout)
+        return time.perf_counter() - start
+
+    def deploy(self):
+        """Queue a deployment on this socket"""
+        self.client.emit("deploy-app", {
+            "app_names": ["app-000"],
+            "requester": f"bench-{self.index}",
+            "namespace": "",
+        })
+
+    def close(self):
+        """Disconnect, ignoring sockets that already went away"""
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+def run_stage(backends, sessions, args):
+    """Connect sessions clients to a fresh server, deploy from each and summarize"""
+    server = Server(backends, sessions, args)
+    clients = [Session(i) for i in range(sessions)]
+    try:
+        server.wait_until_ready(args.timeout)
+        idle = server.status()
+
+        connect_times = []
+        connect_errors = []
+
+        def connect(client):
+            try:
+                connect_times.append(client.connect(server.url, args.timeout))
+            except Exception as e:
+                connect_errors.append(str(e))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.connect_concurrency) as executor:
+            list(executor.map(connect, clients))
+        connect_elapsed = time.perf_counter() - start
+        connected_clients = [client for client in clients if client.client.connected]
+        connected = server.status()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.connect_concurrency) as executor:
+            list(executor.map(lambda client: client.deploy(), connected_clients))
+        deadline = time.monotonic() + args.timeout
+        for client in connected_clients:
+            client.ended.wait(max(0.0, deadline - time.monotonic()))
+        deploy_elapsed = time.perf_counter() - start
+        deployed = server.status()
+    finally:
+        for client in clients:
+            client.close()
+        server.stop()
+
+    latencies = [latency for client in connected_clients for latency in client.latencies]
+    finished = sum(1 for client in connected_clients if client.ended.is_set() and not client.errors)
+    fan_out = summarize(latencies)
+    per_connection = (connected["rss_bytes"] - idle["rss_bytes"]) / len(connected_clients) \
+        if connected_clients else 0
+    return {
+        "sessions": sessions,
+        "connected": len(connected_clients),
+        "connect_errors": len(connect_errors),
+        "connect": dict(summarize(connect_times), elapsed_s=round(connect_elapsed, 3)),
+        "deploys_finished": finished,
+        "deploy_elapsed_s": round(deploy_elapsed, 3),
+        "fan_out": fan_out,
+        "events_per_second": round(len(latencies) / deploy_elapsed, 1) if deploy_elapsed else 0.0,
+        "server_connections": connected["connections"],
+        "rss_idle_bytes": idle["rss_bytes"],
+        "rss_connected_bytes": connected["rss_bytes"],
+        "rss_after_deploy_bytes": deployed["rss_bytes"],
+        "rss_per_connection_bytes": round(per_connection),
+        "sustained": (len(connected_clients) == sessions and finished == sessions
+            and fan_out["p99_ms"] <= args.max_latency_ms),
+    }
+
+def print_stage(result):
+    """Print one stage's results"""
+    print(f"{result['sessions']:>9} {result['connected']:>9} {result['deploys_finished']:>9} "
+          f"{result['connect']['p99_ms']:>12.1f} {result['fan_out']['p50_ms']:>11.1f} "
+          f"{result['fan_out']['p99_ms']:>11.1f} {result['events_per_second']:>9.1f} "
+          f"{result['rss_per_connection_bytes'] / 1024:>11.1f} {'yes' if result['sustained'] else 'no':>9}")
+
+def parse_args():
+    """Command line options"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS,
+        help="comma separated concurrent session counts, one stage each")
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS, help="progress events per stubbed deploy")
+    parser.add_argument("--event-interval", type=float, default=DEFAULT_EVENT_INTERVAL,
+        help="seconds between progress events")
+    parser.add_argument("--max-latency-ms", type=float, default=DEFAULT_MAX_LATENCY_MS,
+        help="p99 fan-out latency a stage must stay under to count as sustained")
+    parser.add_argument("--worker-connections", type=int, default=DEFAULT_WORKER_CONNECTIONS,
+        help="gunicorn --worker-connections for the gevent worker")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="threads opening sockets")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+        help="seconds to wait for the server, each connection and the deploys")
+    parser.add_argument("--output", help="JSON results file, defaults to benchmarks/results/socketio-<time>.json")
+    return parser.parse_args()
+
+def main():
+    """Run every stage against a fresh server, then print and save the results"""
+    args = parse_args()
+    from fakes import FakeKubernetesAPI, FakePrometheusAPI, write_kubeconfig
+    import tempfile
+    kubernetes_api = FakeKubernetesAPI(FIXTURE_SIZE).start()
+    prometheus_api = FakePrometheusAPI(FIXTURE_SIZE).start()
+    kubeconfig = os.path.join(tempfile.mkdtemp(prefix="firelink-bench-"), "kubeconfig")
+    write_kubeconfig(kubeconfig, kubernetes_api.url)
+    backends = {
+        "KUBECONFIG": kubeconfig,
+        "PROMETHEUS_URL": prometheus_api.url,
+        "QONTRACT_BASE_URL": f"{prometheus_api.url}/graphql",
+    }
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "options": {"events": args.events, "event_interval": args.event_interval,
+            "max_latency_ms": args.max_latency_ms, "worker_connections": args.worker_connections},
+        "stages": [],
+        "max_sustained_sessions": 0,
+    }
+    print(f"{'sessions':>9} {'connected':>9} {'finished':>9} {'connect p99':>12} {'fan-out p50':>11} "
+          f"{'fan-out p99':>11} {'events/s':>9} {'KiB/conn':>11} {'sustained':>9}")
+    for sessions in [int(sessions) for sessions in args.sessions.split(",")]:
+        result = run_stage(backends, sessions, args)
+        report["stages"].append(result)
+        print_stage(result)
+        if not result["sustained"]:
+            break
+        report["max_sustained_sessions"] = sessions
+    kubernetes_api.stop()
+    prometheus_api.stop()
+    print(f"\nMax sustained sessions per gevent worker: {report['max_sustained_sessions']}")
+
+    output_path = args.output or os.path.join(
+        DEFAULT_OUTPUT_DIR, f"socketio-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results saved to {output_path}")
+
+if __name__ == '__main__':
+    main()
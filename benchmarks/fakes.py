@@ -0,0 +1,250 @@
+"""Local stand-ins for the Kubernetes API, Prometheus and bonfire used by the offline benchmarks
+
+Every fake is sized by the number of ephemeral namespaces it serves, half of
+which are reserved, so routes can be measured at different cluster sizes
+without a live environment.
+"""
+import re
+import sys
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+RESERVATION_PATH = "/apis/cloud.redhat.com/v1alpha1/namespacereservations"
+PODS_PER_NAMESPACE = 20
+NODES = 12
+
+def namespace_names(size):
+    """Names of the synthetic ephemeral namespaces"""
+    return [f"ephemeral-{i:06d}" for i in range(size)]
+
+def reserved_namespace_names(size):
+    """Names of the synthetic namespaces that are reserved"""
+    return namespace_names(size)[::2]
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients going away mid-request (e.g. a server process being stopped) is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class _FakeServer:
+    """Runs a request handler class on a local port in a background thread"""
+    def __init__(self, handler):
+        self.httpd = _HTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.fake = self
+        self.stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the fake"""
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self):
+        """Serve in the background"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port"""
+        self.stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Avoid delayed-ACK stalls on kept-alive connections so the fakes don't dominate timings
+    disable_nagle_algorithm = True
+
+    def send_json(self, body, status=200):
+        """Answer with a JSON body over the kept-alive connection"""
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class FakeKubernetesAPI(_FakeServer):
+    """Serves namespaces, namespacereservations and the version endpoint.
+
+    Lists honour limit/continue so paginated listing is exercised. Watches are
+    held open without events until their timeout or until the fake stops.
+    """
+    RESOURCE_VERSION = "1000"
+
+    def __init__(self, size):
+        self.size = size
+        self.namespaces = [self._namespace(name) for name in namespace_names(size)]
+        self.reservations = [self._reservation(name) for name in reserved_namespace_names(size)]
+        self.requests = 0
+        super().__init__(_KubernetesHandler)
+
+    def _namespace(self, name):
+        return {
+            "apiVersion": "v1",
+            "kind": "Namespace",
+            "metadata": {
+                "name": name,
+                "resourceVersion": self.RESOURCE_VERSION,
+                "labels": {"operator-ns": "true", "pool": "default"},
+            },
+            "status": {"phase": "Active"},
+        }
+
+    def _reservation(self, namespace):
+        return {
+            "apiVersion": "cloud.redhat.com/v1alpha1",
+            "kind": "NamespaceReservation",
+            "metadata": {
+                "name": f"reservation-{namespace}",
+                "uid": f"uid-{namespace}",
+                "resourceVersion": self.RESOURCE_VERSION,
+                "labels": {"requester": "benchmark"},
+            },
+            "spec": {"pool": "default", "requester": "benchmark"},
+            "status": {"namespace": namespace, "expiration": "2030-01-01T00:00:00Z", "state": "active"},
+        }
+
+class _KubernetesHandler(_JSONHandler):
+    def do_GET(self):
+        fake = self.server.fake
+        fake.requests += 1
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if query.get("watch", ["false"])[0] == "true":
+            self._hold_watch(float(query.get("timeoutSeconds", ["300"])[0]))
+        elif url.path == "/api/v1/namespaces":
+            self._send_list("NamespaceList", fake.namespaces, query)
+        elif url.path == RESERVATION_PATH:
+            self._send_list("NamespaceReservationList", fake.reservations, query)
+        elif url.path == "/version":
+            self.send_json({"major": "1", "minor": "30", "gitVersion": "v1.30.0"})
+        else:
+            self.send_json({"kind": "Status", "status": "Failure", "reason": "NotFound", "code": 404}, 404)
+
+    def _send_list(self, kind, items, query):
+        start = int(query.get("continue", ["0"])[0] or 0)
+        limit = int(query.get("limit", ["0"])[0] or 0) or len(items)
+        metadata = {"resourceVersion": FakeKubernetesAPI.RESOURCE_VERSION}
+        if start + limit < len(items):
+            metadata["continue"] = str(start + limit)
+        self.send_json({"kind": kind, "apiVersion": "v1", "metadata": metadata, "items": items[start:start + limit]})
+
+    def _hold_watch(self, timeout):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.flush()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not self.server.fake.stopping.wait(0.1):
+            pass
+        self.wfile.write(b"0\r\n\r\n")
+
+class FakePrometheusAPI(_FakeServer):
+    """Answers the queries firelink sends with synthetic vectors"""
+    def __init__(self, size):
+        self.size = size
+        self.requests = 0
+        super().__init__(_PrometheusHandler)
+
+    def vector(self, query):
+        """Synthetic result vector for a PromQL query"""
+        now = time.time()
+        if query.startswith("cluster:"):
+            return [{"metric": {}, "value": [now, "0.42"]}]
+        if query in ("kube_node_status_capacity", "kube_node_status_allocatable"):
+            scale = 1.0 if query.endswith("capacity") else 0.9
+            return [
+                {"metric": {"node": f"node-{i:02d}", "resource": resource, "unit": unit},
+                 "value": [now, str(amount * scale)]}
+                for i in range(NODES)
+                for resource, unit, amount in (("cpu", "core", 16), ("memory", "byte", 64 * 1024 ** 3))
+            ]
+        match = re.search(r'namespace="([^"]*)"', query)
+        if match and "by (pod)" in query:
+            return [{"metric": {"pod": f"{match.group(1)}-pod-{i}"}, "value": [now, str(0.01 * i)]}
+                for i in range(PODS_PER_NAMESPACE)]
+        match = re.search(r'namespace=~"([^"]*)"', query)
+        if match:
+            namespaces = match.group(1).split("|")
+            if "label_replace" in query:
+                return [
+                    {"metric": {"namespace": ns, "resource": resource, "kind": kind}, "value": [now, "1.5"]}
+                    for ns in namespaces
+                    for resource in ("cpu", "memory")
+                    for kind in ("limits", "requests", "usage")
+                ]
+            return [{"metric": {"namespace": ns}, "value": [now, "1.5"]} for ns in namespaces]
+        return []
+
+class _PrometheusHandler(_JSONHandler):
+    def do_GET(self):
+        self._answer(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._answer(parse_qs(self.rfile.read(length).decode("utf-8")))
+
+    def _answer(self, params):
+        fake = self.server.fake
+        fake.requests += 1
+        if not urlparse(self.path).path.startswith("/api/v1/"):
+            self.send_json({"status": "error"}, 404)
+            return
+        query = params.get("query", [""])[0]
+        self.send_json({"status": "success", "data": {"resultType": "vector", "result": fake.vector(query)}})
+
+def write_kubeconfig(path, server_url):
+    """Write a kubeconfig pointing at a fake API server"""
+    config = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [{"name": "fake", "cluster": {"server": server_url}}],
+        "users": [{"name": "benchmark", "user": {"token": "benchmark"}}],
+        "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "benchmark"}}],
+        "current-context": "fake",
+    }
+    with open(path, "w", encoding="utf-8") as kubeconfig:
+        json.dump(config, kubeconfig)
+
+def stub_bonfire(size, apps=50, latency=0.0):
+    """Replace the bonfire calls firelink makes with synthetic answers.
+
+    latency adds a sleep to the calls that would reach qontract, GitHub or the
+    cluster so their cost shows up in route timings.
+    """
+    from bonfire import bonfire
+
+    def slow(value):
+        if latency:
+            time.sleep(latency)
+        return value
+
+    apps_config = {
+        f"app-{i:03d}": {"name": f"app-{i:03d}", "components": [{"name": f"app-{i:03d}-service"}]}
+        for i in range(apps)
+    }
+    reserved = set(reserved_namespace_names(size))
+    bonfire.has_ns_operator = lambda: True
+    bonfire._get_apps_config = lambda *args, **kwargs: slow(apps_config)
+    bonfire.find_clowd_env_for_ns = lambda ns: {"metadata": {"name": f"env-{ns}"}}
+    bonfire._process = lambda app_names, *args: slow({
+        "kind": "List",
+        "apiVersion": "v1",
+        "items": [{"apiVersion": "cloud.redhat.com/v1alpha1", "kind": "ClowdApp",
+            "metadata": {"name": name}, "spec": {"envName": args[10]}} for name in app_names],
+    })
+    bonfire.describe_namespace = lambda ns, output: slow(
+        f"Current project: {ns}\nProject URL: https://console/{ns}\n"
+        f"Reserved: {ns in reserved}\n3 ClowdApps deployed, 1 Frontends deployed\n")
@@ -1,10 +1,17 @@
 """Class for working with apps in the Insights platform."""
 import json
 import os 
+import gevent
+import gevent.pool
 from bonfire import bonfire
 from bonfire.utils import AppOrComponentSelector
 from bonfire.elastic_logging import ElasticLogger
 from firelink.adaptor_class_helpers import AdaptorClassHelpers
+from firelink.apps_refresher import get_apps_list_refresher
+from firelink.apply_index import get_apply_index, annotate
+from firelink.instrumentation import track_backend
+from firelink.singleflight import get_singleflight
+from firelink.template_cache import get_template_cache
 
 class Apps:
     """Apps class for working"""
@@ -12,7 +19,20 @@ class Apps:
     DEPLOY_MONITOR_EVENT = 'monitor-deploy-app'
     DEPLOY_END_EVENT = 'end-deploy-app'
     DEPLOY_ERROR_EVENT = 'error-deploy-app'
-
+    # Stands in for the ClowdEnvironment name while templates are rendered
+    CLOWD_ENV_PLACEHOLDER = "firelink-pending-clowd-env"
+    # Request fields that determine the processed templates
+    TEMPLATE_REQUEST_FIELDS = (
+        "app_names", "source", "get_dependencies", "optional_deps_method", "local_config_method",
+        "set_image_tag", "ref_env", "fallback_ref_env", "target_env", "set_template_ref",
+        "set_parameter", "clowd_env", "local_config_path", "remove_resources", "no_remove_resources",
+        "remove_dependencies", "no_remove_dependencies", "single_replicas", "component_filter",
+        "local", "frontends", "preferred_params",
+    )
+    # Parallel apply runs ClowdApps after the config they use, then the kinds that depend on apps
+    APP_KINDS = ("ClowdApp",)
+    APP_DEPENDENT_KINDS = ("Frontend", "ClowdJobInvocation")
+    DEFAULT_APPLY_WORKERS = 4
 
     def __init__(self, emit=None, jsonify=json.dumps):
         self.elastic_logger = ElasticLogger()
@@ -51,6 +71,66 @@ class Apps:
         apps_array.sort(key=lambda app: app['name'])
         return apps_array
 
+    def _process_templates(self, request, rendered=None):
+        """Process the request's app templates for its clowd_env.
+
+        rendered is the output of _render_templates() if it was already started
+        ahead of time.
+        """
+        if rendered is None:
+            rendered = self._render_templates(request)
+        return self._bind_clowd_env(rendered, request["clowd_env"])
+
+    def _render_templates(self, request):
+        """Render the request's app templates with a placeholder clowd_env.
+
+        The clowd_env only fills in template parameters, so the output doesn't
+        depend on the namespace and can be rendered before one is reserved and
+        reused for any namespace. Recent results for identical requests are
+        served from the template cache.
+        """
+        fields = {name: request.get(name) for name in self.TEMPLATE_REQUEST_FIELDS if name != "clowd_env"}
+        return get_template_cache().get_or_process(
+            fields, lambda: self._bonfire_process(dict(request, clowd_env=self.CLOWD_ENV_PLACEHOLDER)))
+
+    def _bind_clowd_env(self, value, clowd_env):
+        """Copy of rendered templates with the placeholder replaced by the real clowd_env"""
+        if isinstance(value, str):
+            return value.replace(self.CLOWD_ENV_PLACEHOLDER, clowd_env)
+        if isinstance(value, dict):
+            return {key: self._bind_clowd_env(item, clowd_env) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._bind_clowd_env(item, clowd_env) for item in value]
+        return value
+
+    def _bonfire_process(self, request):
+        # TODO: Send up a PR to bonfire to make a public method that accepts a dict
+        with track_backend("bonfire", "_process"):
+            return bonfire._process(
+                request["app_names"],
+                request["source"],
+                request["get_dependencies"],
+                request["optional_deps_method"],
+                request["local_config_method"],
+                request["set_image_tag"],
+                request["ref_env"],
+                request["fallback_ref_env"],
+                request["target_env"],
+                request["set_template_ref"],
+                request["set_parameter"],
+                request["clowd_env"],
+                request["local_config_path"],
+                AppOrComponentSelector(bool(request.get("remove_resources") == "all"), request.get("remove_resources", []), []),
+                AppOrComponentSelector(bool(request.get("no_remove_resources") == "all"), request.get("no_remove_resources", []), []),
+                AppOrComponentSelector(bool(request.get("remove_dependencies") == "all"), [], request.get("remove_dependencies",[])),
+                AppOrComponentSelector(bool(request.get("no_remove_dependencies") == "all"), [], request.get("no_remove_dependencies", [])),
+                request["single_replicas"],
+                request["component_filter"],
+                request["local"],
+                request["frontends"],
+                request["preferred_params"],
+            )
+
     def get_processed_template(self, request):
         """Get the processed template for an app."""
         namespace = request["namespace"]
@@ -58,30 +138,7 @@ class Apps:
         if not clowd_env:
             raise bonfire.FatalError("Could not find a ClowdEnvironment tied to ns '{ns}'.")
         request["clowd_env"] = clowd_env
-        apps_config = bonfire._process(
-            request["app_names"],
-            request["source"],
-            request["get_dependencies"],
-            request["optional_deps_method"],
-            request["local_config_method"],
-            request["set_image_tag"],
-            request["ref_env"],
-            request["fallback_ref_env"],
-            request["target_env"],
-            request["set_template_ref"],
-            request["set_parameter"],
-            request["clowd_env"],
-            request["local_config_path"],
-            AppOrComponentSelector(bool(request.get("remove_resources") == "all"), request.get("remove_resources", []), []),
-            AppOrComponentSelector(bool(request.get("no_remove_resources") == "all"), request.get("no_remove_resources", []), []),
-            AppOrComponentSelector(bool(request.get("remove_dependencies") == "all"), [], request.get("remove_dependencies",[])),
-            AppOrComponentSelector(bool(request.get("no_remove_dependencies") == "all"), [], request.get("no_remove_dependencies", [])),
-            request["single_replicas"],
-            request["component_filter"],
-            request["local"],
-            request["frontends"],
-            request["preferred_params"],
-        )
+        apps_config = self._process_templates(request)
 
         if not apps_config["items"]:
             raise bonfire.FatalError("No configurations found to apply!")
@@ -98,20 +155,29 @@ class Apps:
         preferred_params=None,
     ):
         """List apps available for deployment."""
-        self.helpers.route_guard()
         if not preferred_params:
             preferred_params = {}
-        apps = bonfire._get_apps_config(
-            source,
-            target_env,
-            ref_env,
-            fallback_ref_env,
-            None,
-            None,
-            preferred_params)
-        apps_array = self._process_bonfire_apps_list(apps)
+        key = (source, target_env, ref_env, fallback_ref_env, json.dumps(preferred_params, sort_keys=True))
+        apps_array = get_apps_list_refresher().get(
+            key,
+            lambda: get_singleflight().do(
+                ("apps_list",) + key,
+                self._fetch_apps_list, source, target_env, ref_env, fallback_ref_env, preferred_params))
         return self.jsonify(apps_array)
 
+    def _fetch_apps_list(self, source, target_env, ref_env, fallback_ref_env, preferred_params):
+        self.helpers.route_guard()
+        with track_backend("bonfire", "_get_apps_config"):
+            apps = bonfire._get_apps_config(
+                source,
+                target_env,
+                ref_env,
+                fallback_ref_env,
+                None,
+                None,
+                preferred_params)
+        return self._process_bonfire_apps_list(apps)
+
     def _deploy_error_handler(self, err, request, ns, reserved_new_ns):
         try:
             if not request["no_release_on_fail"] and reserved_new_ns:
@@ -134,43 +200,77 @@ class Apps:
         cloud_env_response = bonfire.find_clowd_env_for_ns(ns)
         return cloud_env_response["metadata"]["name"] if cloud_env_response else None
 
-    def _process_apps(self, request, ns, _reserved_new_ns):
-        # TODO: Send up a PR to bonfire to make a public method that accepts a dict
-        apps_config = bonfire._process(
-            request["app_names"],
-            request["source"],
-            request["get_dependencies"],
-            request["optional_deps_method"],
-            request["local_config_method"],
-            request["set_image_tag"],
-            request["ref_env"],
-            request["fallback_ref_env"],
-            request["target_env"],
-            request["set_template_ref"],
-            request["set_parameter"],
-            request["clowd_env"],
-            request["local_config_path"],
-            AppOrComponentSelector(bool(request.get("remove_resources") == "all"), request.get("remove_resources", []), []),
-            AppOrComponentSelector(bool(request.get("no_remove_resources") == "all"), request.get("no_remove_resources", []), []),
-            AppOrComponentSelector(bool(request.get("remove_dependencies") == "all"), [], request.get("remove_dependencies",[])),
-            AppOrComponentSelector(bool(request.get("no_remove_dependencies") == "all"), [], request.get("no_remove_dependencies", [])),
-            request["single_replicas"],
-            request["component_filter"],
-            request["local"],
-            request["frontends"],
-            request["preferred_params"],
-        )
+    def _process_apps(self, request, ns, _reserved_new_ns, prerender=None):
+        rendered = prerender.get() if prerender is not None else None
+        apps_config = self._process_templates(request, rendered)
 
         if not apps_config["items"]:
             self.emit(self.DEPLOY_MONITOR_EVENT, 
                 {'message':"No configurations found to apply!", 'completed': False, 'error': True})
             raise bonfire.FatalError("No configurations found to apply!")
 
+        items = apps_config["items"]
+        if request.get("force_apply"):
+            changed, unchanged = list(items), []
+        else:
+            changed, unchanged = get_apply_index().diff(ns, items)
         self.emit(self.DEPLOY_MONITOR_EVENT, 
-            {'message':"Applying app configs...", 'completed': False, 'error': False})
-        bonfire.apply_config(ns, apps_config)
+            {'message': f"Applying {len(changed)} app configs, skipping {len(unchanged)} unchanged...",
+             'completed': False, 'error': False, 'applied': len(changed), 'skipped': len(unchanged)})
+        if not changed:
+            return apps_config
+        # The live objects keep the fingerprint of what was applied for the next deploy to compare against
+        changed = [annotate(item) for item in changed]
+        if self._parallel_apply_requested(request):
+            self._apply_in_parallel(ns, apps_config, changed)
+        else:
+            bonfire.apply_config(ns, dict(apps_config, items=changed))
         return apps_config
 
+    def _parallel_apply_requested(self, request):
+        default = os.environ.get('DEPLOY_PARALLEL_APPLY', 'False').lower() == 'true'
+        return bool(request.get("parallel_apply", default))
+
+    def _apply_groups(self, items):
+        """Split items into apply stages: config, then ClowdApps, then kinds that depend on apps"""
+        config, clowdapps, dependents = [], [], []
+        for item in items:
+            if item.get("kind") in self.APP_KINDS:
+                clowdapps.append(item)
+            elif item.get("kind") in self.APP_DEPENDENT_KINDS:
+                dependents.append(item)
+            else:
+                config.append(item)
+        return [config, clowdapps, dependents]
+
+    def _apply_in_parallel(self, ns, apps_config, items):
+        """Apply items stage by stage, running each stage with bounded concurrency.
+
+        Every item is applied on its own so its progress can be reported. A stage
+        only starts once the previous one fully succeeded.
+        """
+        workers = int(os.environ.get('DEPLOY_APPLY_WORKERS', str(self.DEFAULT_APPLY_WORKERS)))
+        total = len(items)
+        applied = []
+
+        def apply_item(item):
+            bonfire.apply_config(ns, dict(apps_config, items=[item]))
+            applied.append(item)
+            metadata = item.get("metadata") or {}
+            self.emit(self.DEPLOY_MONITOR_EVENT,
+                {'message': f"Applied {item.get('kind')} {metadata.get('name')} ({len(applied)}/{total})",
+                 'completed': False, 'error': False, 'applied': len(applied), 'total': total})
+
+        for group in self._apply_groups(items):
+            if not group:
+                continue
+            pool = gevent.pool.Pool(workers)
+            greenlets = [pool.spawn(apply_item, item) for item in group]
+            pool.join()
+            failed = [greenlet for greenlet in greenlets if not greenlet.successful()]
+            if failed:
+                raise failed[0].exception
+
     def deploy(self, deploy_request):
         """Deploy an app to a namespace."""
         try:
@@ -180,20 +280,26 @@ class Apps:
                 {'message': "Namespace Operator not detected on cluster", 'completed': False, 'error': True})
             return
 
+        # Templates don't depend on the namespace, so fetch and render them while
+        # the namespace is reserved and its ClowdEnvironment looked up
+        prerender = gevent.spawn(self._render_templates, deploy_request)
+
         try:
-            ns, reserved_new_ns = bonfire._get_namespace(
-                deploy_request["namespace"], 
-                deploy_request["name"], 
-                deploy_request["requester"], 
-                deploy_request["duration"], 
-                deploy_request["pool"], 
-                deploy_request["timeout"], 
-                deploy_request["local"], 
-                True, 
-                True)
+            with track_backend("bonfire", "_get_namespace"):
+                ns, reserved_new_ns = bonfire._get_namespace(
+                    deploy_request["namespace"], 
+                    deploy_request["name"], 
+                    deploy_request["requester"], 
+                    deploy_request["duration"], 
+                    deploy_request["pool"], 
+                    deploy_request["timeout"], 
+                    deploy_request["local"], 
+                    True, 
+                    True)
             self.emit(self.DEPLOY_MONITOR_EVENT, 
                 {'message': f"Using namespace {ns}", 'completed': False, 'namespace': ns, 'error': False})
         except Exception as e:
+            prerender.kill(block=False)
             self.emit(self.DEPLOY_ERROR_EVENT, 
                 {'message': f"Namespace failure: {str(e)}", 'completed': False, 'error': True})
             return
@@ -203,6 +309,7 @@ class Apps:
 
         clowd_env = self._get_clowdenv_for_ns(ns)
         if not clowd_env:
+            prerender.kill(block=False)
             self.emit(self.DEPLOY_ERROR_EVENT, 
                 {'message': f"Could not find a ClowdEnvironment tied to ns '{ns}'.", 'completed': False, 'error': True})
             return
@@ -211,7 +318,7 @@ class Apps:
             {'message': "Processing app templates...", 'completed': False, 'error': False})
 
         try:
-            self._process_apps(deploy_request, ns, reserved_new_ns)
+            self._process_apps(deploy_request, ns, reserved_new_ns, prerender)
         except (bonfire.TimedOutError, bonfire.FatalError, Exception) as err:
             self._deploy_error_handler(err, deploy_request, ns, reserved_new_ns)
             return
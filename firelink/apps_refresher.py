@@ -0,0 +1,85 @@
+"""Stale-while-revalidate snapshots of the processed apps list"""
+import os
+import threading
+import time
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def get_apps_list_refresher():
+    """Get the process-wide apps list refresher"""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = AppsListRefresher()
+        return _refresher
+
+class AppsListRefresher:
+    """Keeps the last good apps list for each (source, target_env, ref_env, fallback_ref_env) key.
+
+    Requests are answered from the snapshot straight away. A snapshot older than
+    APPS_LIST_MAX_AGE seconds is refreshed in the background, and a failed refresh
+    keeps serving the previous snapshot. Only the very first request for a key has
+    to wait for the apps list to be fetched.
+    """
+    DEFAULT_MAX_AGE = 300
+
+    def __init__(self):
+        self.max_age = float(os.getenv("APPS_LIST_MAX_AGE", str(self.DEFAULT_MAX_AGE)))
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._loaders = {}
+        self._refreshing = set()
+        self._warmer = None
+
+    def get(self, key, loader):
+        """Get the apps list snapshot for a key, loading it with loader() when needed"""
+        with self._lock:
+            self._loaders[key] = loader
+            snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            return self._refresh(key, loader)
+        fetched_at, apps = snapshot
+        if time.monotonic() - fetched_at > self.max_age:
+            self._refresh_in_background(key, loader)
+        return apps
+
+    def start(self):
+        """Periodically refresh stale snapshots even when no requests come in"""
+        if self._warmer is not None:
+            return
+        self._warmer = threading.Thread(target=self._warm_loop, daemon=True)
+        self._warmer.start()
+
+    def _warm_loop(self):
+        while True:
+            time.sleep(self.max_age)
+            with self._lock:
+                stale = [
+                    (key, self._loaders[key]) for key, (fetched_at, _) in self._snapshots.items()
+                    if time.monotonic() - fetched_at > self.max_age
+                ]
+            for key, loader in stale:
+                self._refresh_in_background(key, loader)
+
+    def _refresh(self, key, loader):
+        apps = loader()
+        with self._lock:
+            self._snapshots[key] = (time.monotonic(), apps)
+        return apps
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._background_refresh, args=(key, loader), daemon=True).start()
+
+    def _background_refresh(self, key, loader):
+        try:
+            self._refresh(key, loader)
+        except Exception as e:
+            print(f"Failed to refresh apps list, serving the previous snapshot: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
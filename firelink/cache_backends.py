@@ -0,0 +1,123 @@
+"""Cache tiers used by the response cache"""
+import os
+import threading
+import time
+
+def create_cache_backend(flask_cache):
+    """Create the cache tier selected by CACHE_BACKEND.
+
+    "local" (the default) keeps entries in this process's Flask-Caching instance,
+    "redis" shares them between workers and replicas through a Redis-protocol
+    server, and "memory" is an in-process stand-in for the shared tier.
+    """
+    backend = os.getenv("CACHE_BACKEND", "local").lower()
+    if backend == "redis":
+        return RedisCacheBackend(redis_url_from_env())
+    if backend == "memory":
+        return InMemoryCacheBackend()
+    return FlaskCacheBackend(flask_cache)
+
+def redis_url_from_env():
+    """Get the Redis URL from REDIS_URL or from the Clowder in-memory DB config"""
+    url = os.getenv("REDIS_URL")
+    if url:
+        return url
+    import app_common_python
+    if app_common_python.isClowderEnabled() and app_common_python.LoadedConfig.inMemoryDb:
+        in_memory_db = app_common_python.LoadedConfig.inMemoryDb
+        scheme = "rediss" if in_memory_db.sslMode else "redis"
+        password = f":{in_memory_db.password}@" if in_memory_db.password else ""
+        return f"{scheme}://{password}{in_memory_db.hostname}:{in_memory_db.port}/0"
+    raise ValueError("CACHE_BACKEND is redis but neither REDIS_URL nor a Clowder inMemoryDb is configured")
+
+class FlaskCacheBackend:
+    """Per-process cache tier backed by the Flask-Caching instance.
+
+    The simple Flask-Caching backend prunes keys once it holds more than its
+    threshold, starting with those that never expire. Keys stored without a
+    timeout, such as cache group generations, are therefore kept in a dict of
+    their own so they can't be evicted.
+    """
+    name = "local"
+
+    def __init__(self, flask_cache):
+        self.flask_cache = flask_cache
+        self._permanent = {}
+
+    def get(self, key):
+        """Get the bytes stored under a key, or None"""
+        if key in self._permanent:
+            return self._permanent[key]
+        return self.flask_cache.get(key)
+
+    def set(self, key, value, timeout):
+        """Store bytes under a key for timeout seconds, zero meaning forever"""
+        if timeout:
+            self._permanent.pop(key, None)
+            self.flask_cache.set(key, value, timeout=timeout)
+        else:
+            self._permanent[key] = value
+            self.flask_cache.delete(key)
+
+    def delete(self, key):
+        """Remove a key"""
+        self._permanent.pop(key, None)
+        self.flask_cache.delete(key)
+
+class RedisCacheBackend:
+    """Cache tier shared between workers and replicas through a Redis-protocol server"""
+    name = "redis"
+    DEFAULT_SOCKET_TIMEOUT = 1
+
+    def __init__(self, url):
+        # redis is only needed when the shared tier is enabled
+        import redis
+        socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", str(self.DEFAULT_SOCKET_TIMEOUT)))
+        self.client = redis.Redis.from_url(
+            url,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+        )
+
+    def get(self, key):
+        """Get the bytes stored under a key, or None"""
+        return self.client.get(key)
+
+    def set(self, key, value, timeout):
+        """Store bytes under a key for timeout seconds, zero meaning forever"""
+        self.client.set(key, value, ex=timeout or None)
+
+    def delete(self, key):
+        """Remove a key"""
+        self.client.delete(key)
+
+class InMemoryCacheBackend:
+    """In-process stand-in for the shared cache tier, mainly for tests"""
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        """Get the bytes stored under a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, timeout):
+        """Store bytes under a key for timeout seconds, zero meaning forever"""
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+
+    def delete(self, key):
+        """Remove a key"""
+        with self._lock:
+            self._entries.pop(key, None)
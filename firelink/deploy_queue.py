@@ -0,0 +1,230 @@
+"""Background job queue for app deployments"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+_queue = None
+
+def get_deploy_queue():
+    """Get the process-wide deploy queue, or None if it was never started"""
+    return _queue
+
+def start_deploy_queue(runner, emit):
+    """Start the process-wide deploy queue"""
+    global _queue
+    if _queue is None:
+        _queue = DeployQueue(runner, emit)
+        _queue.start()
+    return _queue
+
+class DeployQueueFull(Exception):
+    """Raised when a deployment is submitted while the queue is at capacity"""
+
+class DeployJob:
+    """A queued deployment and the events it has emitted so far"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    DEFAULT_EVENT_HISTORY = 100
+
+    def __init__(self, request, requester, emit):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.requester = requester
+        self.status = self.QUEUED
+        self.message = ""
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.subscribers = set()
+        self.events = deque(maxlen=int(os.getenv("DEPLOY_JOB_EVENT_HISTORY", str(self.DEFAULT_EVENT_HISTORY))))
+        self._emit = emit
+        self._lock = threading.Lock()
+
+    def emit(self, event, data):
+        """Record an event and stream it to every subscribed socket.
+
+        Matches the emit(event, data) signature Apps expects.
+        """
+        data = dict(data, job_id=self.id)
+        with self._lock:
+            self.events.append((event, data))
+            subscribers = list(self.subscribers)
+            if event == "end-deploy-app":
+                self.status = self.SUCCEEDED if data.get("completed") else self.FAILED
+                self.message = data.get("message", "")
+            elif event == "error-deploy-app" and self.status == self.RUNNING:
+                self.status = self.FAILED
+                self.message = data.get("message", "")
+        for sid in subscribers:
+            try:
+                self._emit(event, data, to=sid)
+            except Exception as e:
+                print(f"Failed to send {event} for deploy job {self.id}: {e}")
+
+    def subscribe(self, sid):
+        """Stream this job's events to a socket, replaying the ones already emitted"""
+        with self._lock:
+            self.subscribers.add(sid)
+            history = list(self.events)
+        for event, data in history:
+            self._emit(event, data, to=sid)
+
+    def unsubscribe(self, sid):
+        """Stop streaming events to a socket"""
+        with self._lock:
+            self.subscribers.discard(sid)
+
+    def finished(self):
+        """True once the job has succeeded or failed"""
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def to_dict(self):
+        """Job status as returned by the status API"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "message": self.message,
+            "requester": self.requester,
+            "app_names": self.request.get("app_names", []),
+            "namespace": self.request.get("namespace", ""),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class DeployQueue:
+    """Runs deployments on a bounded pool of background workers.
+
+    Jobs are started in submission order, except that a requester never has more
+    than DEPLOY_MAX_PER_REQUESTER deployments running at once; their later jobs
+    wait while other requesters' jobs go ahead. Finished jobs are kept for
+    DEPLOY_JOB_RETENTION seconds so their status can still be looked up.
+    """
+    DEFAULT_WORKERS = 2
+    DEFAULT_MAX_PER_REQUESTER = 1
+    DEFAULT_MAX_QUEUED = 50
+    DEFAULT_RETENTION_SECONDS = 3600
+    WAIT_TIME_SAMPLES = 100
+
+    def __init__(self, runner, emit):
+        self.runner = runner
+        self.emit = emit
+        self.workers = int(os.getenv("DEPLOY_WORKERS", str(self.DEFAULT_WORKERS)))
+        self.max_per_requester = int(os.getenv(
+            "DEPLOY_MAX_PER_REQUESTER", str(self.DEFAULT_MAX_PER_REQUESTER)))
+        self.max_queued = int(os.getenv("DEPLOY_MAX_QUEUED", str(self.DEFAULT_MAX_QUEUED)))
+        self.retention = float(os.getenv("DEPLOY_JOB_RETENTION", str(self.DEFAULT_RETENTION_SECONDS)))
+        self._condition = threading.Condition()
+        self._pending = []
+        self._jobs = {}
+        self._running_by_requester = {}
+        self._wait_times = deque(maxlen=self.WAIT_TIME_SAMPLES)
+        self._threads = []
+
+    def start(self):
+        """Start the worker pool"""
+        if self._threads:
+            return
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, request, sid=None):
+        """Queue a deployment, optionally streaming its events to a socket. Returns the job."""
+        job = DeployJob(request, request.get("requester") or "", self.emit)
+        if sid is not None:
+            job.subscribe(sid)
+        with self._condition:
+            self._prune()
+            if len(self._pending) >= self.max_queued:
+                raise DeployQueueFull(f"Deploy queue is full ({self.max_queued} jobs waiting)")
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            position = len(self._pending)
+            self._condition.notify_all()
+        job.emit("monitor-deploy-app", {
+            "message": f"Deployment queued as job {job.id}, position {position} in the queue",
+            "completed": False,
+            "error": False,
+        })
+        return job
+
+    def unsubscribe(self, sid):
+        """Stop streaming any job's events to a socket, e.g. once it has disconnected"""
+        for job in self.jobs():
+            job.unsubscribe(sid)
+
+    def get(self, job_id):
+        """Look up a job by ID"""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Snapshot of every known job, oldest first"""
+        with self._condition:
+            return sorted(self._jobs.values(), key=lambda job: job.submitted_at)
+
+    def stats(self):
+        """Queue depth, running jobs and wait time in seconds"""
+        now = time.time()
+        with self._condition:
+            depth = len(self._pending)
+            running = sum(self._running_by_requester.values())
+            oldest_wait = now - self._pending[0].submitted_at if self._pending else 0.0
+            wait_times = list(self._wait_times)
+        return {
+            "workers": self.workers,
+            "depth": depth,
+            "running": running,
+            "oldest_wait_seconds": round(oldest_wait, 3),
+            "average_wait_seconds": round(sum(wait_times) / len(wait_times), 3) if wait_times else 0.0,
+            "max_wait_seconds": round(max(wait_times), 3) if wait_times else 0.0,
+        }
+
+    def _next_job(self):
+        """Take the oldest pending job whose requester is under their limit. Caller holds the lock."""
+        for index, job in enumerate(self._pending):
+            if self._running_by_requester.get(job.requester, 0) < self.max_per_requester:
+                return self._pending.pop(index)
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                self._running_by_requester[job.requester] = self._running_by_requester.get(job.requester, 0) + 1
+                job.status = DeployJob.RUNNING
+                job.started_at = time.time()
+                self._wait_times.append(job.started_at - job.submitted_at)
+            try:
+                self.runner(job)
+            except Exception as e:
+                job.emit("error-deploy-app", {
+                    "message": f"Server error deploying apps: {str(e)}",
+                    "completed": False,
+                    "error": True,
+                })
+            finally:
+                with self._condition:
+                    if not job.finished():
+                        job.status = DeployJob.SUCCEEDED
+                    job.finished_at = time.time()
+                    self._running_by_requester[job.requester] -= 1
+                    if not self._running_by_requester[job.requester]:
+                        del self._running_by_requester[job.requester]
+                    self._condition.notify_all()
+
+    def _prune(self):
+        """Forget finished jobs past their retention. Caller holds the lock."""
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
@@ -5,20 +5,6 @@ from bonfire import qontract
 
 class FlaskAppHelpers:
     """Helper functions for the Flask app."""
-    def health(self):
-        """We check health by ensuring we can talk to the OpenShift API."""
-        try:
-            subprocess.run(
-                ["oc", "whoami"],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            return True
-        except subprocess.CalledProcessError as _e:
-            return False
-
     def login_to_openshift(self):
         """Login to OpenShift using the OC_TOKEN and OC_SERVER env vars."""
         oc_token = os.environ.get('OC_TOKEN')
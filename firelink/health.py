@@ -0,0 +1,124 @@
+"""Background health monitoring of the backends firelink depends on"""
+import os
+import threading
+import time
+import requests
+from bonfire import config as bonfire_config
+from firelink.kube_client import get_kube_client_registry
+
+_monitor = None
+
+def get_health_monitor():
+    """Get the process-wide health monitor, creating it on first use"""
+    global _monitor
+    if _monitor is None:
+        _monitor = HealthMonitor()
+    return _monitor
+
+class HealthMonitor:
+    """Probes the Kubernetes API server, Prometheus and qontract on an interval.
+
+    Probe results are cached so health endpoints answer in constant time without
+    touching any backend. Readiness requires the checks named in
+    HEALTH_REQUIRED_CHECKS to pass; the other checks are only reported.
+    Liveness only requires the probe loop itself to keep running, and its
+    first run to finish within the same bound after start().
+    """
+    DEFAULT_INTERVAL = 15
+    DEFAULT_TIMEOUT = 5
+    DEFAULT_REQUIRED_CHECKS = "kubernetes"
+
+    def __init__(self):
+        self.interval = float(os.getenv("HEALTH_CHECK_INTERVAL", str(self.DEFAULT_INTERVAL)))
+        self.timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT", str(self.DEFAULT_TIMEOUT)))
+        self.required = [name.strip() for name in
+            os.getenv("HEALTH_REQUIRED_CHECKS", self.DEFAULT_REQUIRED_CHECKS).split(",") if name.strip()]
+        self.checks = {
+            "kubernetes": self._check_kubernetes,
+            "prometheus": self._check_prometheus,
+            "qontract": self._check_qontract,
+        }
+        self._lock = threading.Lock()
+        self._results = {}
+        self._last_run = None
+        self._started_at = None
+        self._thread = None
+
+    def start(self):
+        """Start probing in the background"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def run_checks(self):
+        """Run every probe once and cache the results"""
+        for name, check in self.checks.items():
+            start = time.monotonic()
+            try:
+                check()
+                result = {"ok": True}
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            result["latency_ms"] = round((time.monotonic() - start) * 1000, 1)
+            result["checked_at"] = time.time()
+            with self._lock:
+                self._results[name] = result
+        with self._lock:
+            self._last_run = time.monotonic()
+
+    def liveness(self):
+        """Alive while the probe loop keeps running. Returns (ok, report)."""
+        with self._lock:
+            # Until the first run finishes, measure from when the loop was started
+            last_run = self._last_run if self._last_run is not None else self._started_at
+        # Allow for probes that take up to their timeout each
+        stale_after = 3 * (self.interval + self.timeout * len(self.checks))
+        ok = last_run is None or time.monotonic() - last_run < stale_after
+        return ok, {"status": "ok" if ok else "stalled"}
+
+    def readiness(self):
+        """Ready once every required dependency passed its last probe. Returns (ok, report)."""
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        for name, result in results.items():
+            result["required"] = name in self.required
+        ok = all(results.get(name, {}).get("ok", False) for name in self.required)
+        return ok, {"status": "ok" if ok else "unavailable", "checks": results}
+
+    def _run(self):
+        while True:
+            try:
+                self.run_checks()
+            except Exception as e:
+                print(f"Health checks failed: {e}")
+            time.sleep(self.interval)
+
+    def _check_kubernetes(self):
+        get_kube_client_registry().version().get_code(_request_timeout=self.timeout)
+
+    def _check_prometheus(self):
+        url = os.getenv("PROMETHEUS_URL")
+        if not url:
+            raise RuntimeError("PROMETHEUS_URL is not set")
+        # The shared client's read timeout and retries could hold the probe loop for minutes
+        # and stall liveness, so probe with a single request bounded by the health check timeout.
+        # Routed Prometheus and thanos-querier often refuse "/", but serve the query API's paths
+        response = requests.get(f"{url.rstrip('/')}/api/v1/status/buildinfo", headers={"Authorization": f"Bearer {os.getenv('OC_TOKEN')}"},
+            verify=False, timeout=self.timeout)
+        if not response.ok:
+            raise RuntimeError(f"Prometheus answered with HTTP {response.status_code}")
+
+    def _check_qontract(self):
+        auth = None
+        headers = None
+        if bonfire_config.QONTRACT_TOKEN:
+            headers = {"Authorization": bonfire_config.QONTRACT_TOKEN}
+        elif bonfire_config.QONTRACT_USERNAME and bonfire_config.QONTRACT_PASSWORD:
+            auth = (bonfire_config.QONTRACT_USERNAME, bonfire_config.QONTRACT_PASSWORD)
+        response = requests.get(bonfire_config.QONTRACT_BASE_URL, auth=auth, headers=headers, timeout=self.timeout)
+        # GraphQL endpoints may reject a bare GET, any non-5xx answer means it is reachable
+        if response.status_code >= 500:
+            raise RuntimeError(f"qontract answered with HTTP {response.status_code}")
@@ -0,0 +1,268 @@
+"""Prometheus metrics about firelink itself, served from /metrics"""
+import bisect
+import functools
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Registry:
+    """Holds every metric and renders them in the Prometheus text format"""
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric, returning the one already registered under its name if any"""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def unregister(self, name):
+        """Remove a metric by name"""
+        self._metrics.pop(name, None)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add to the value"""
+        self.value += amount
+
+    def dec(self, amount=1):
+        """Subtract from the value"""
+        self.value -= amount
+
+    def set(self, value):
+        """Replace the value"""
+        self.value = value
+
+class _Metric:
+    """A metric family with one child per combination of label values.
+
+    Children are built by child_factory, a plain _Value unless a subclass
+    passes its own. They are created with dict.setdefault and updated with
+    plain arithmetic, neither of which can be interrupted by a greenlet switch,
+    so the hot path takes no locks. Under real OS threads an increment may
+    rarely be lost, which is acceptable for monitoring.
+    """
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, child_factory=_Value):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.child_factory = child_factory
+        self._children = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """Get the child for a combination of label values"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self.child_factory())
+        return child
+
+    def samples(self):
+        """Exposition lines for every child"""
+        lines = []
+        for values, child in list(self._children.items()):
+            lines.extend(self._child_samples(values, child))
+        return lines
+
+    def _child_samples(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    metric_type = "counter"
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    metric_type = "gauge"
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Record one observation"""
+        index = bisect.bisect_left(self.upper_bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry,
+            child_factory=functools.partial(_HistogramValue, self.upper_bounds))
+
+    def _child_samples(self, values, child):
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self.upper_bounds, list(child.counts)):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(float(upper_bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        total = child.count
+        labels = _format_labels(self.labelnames, values, [("le", "+Inf")])
+        lines.append(f"{self.name}_bucket{labels} {total}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+class CallbackMetric:
+    """Metric whose samples are read from a function when /metrics is scraped.
+
+    The function returns a dict mapping tuples of label values to numbers.
+    """
+    def __init__(self, name, documentation, metric_type, labelnames, func, registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.func = func
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self):
+        """Exposition lines for the values returned by the function"""
+        try:
+            values = self.func()
+        except Exception as e:
+            print(f"Failed to collect {self.name}: {e}")
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values.items()]
+
+HTTP_REQUEST_DURATION = Histogram(
+    "firelink_http_request_duration_seconds",
+    "Latency of HTTP requests by route, method and status",
+    ("route", "method", "status"))
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "firelink_http_requests_in_flight",
+    "HTTP requests currently being served by route",
+    ("route",))
+BACKEND_CALL_DURATION = Histogram(
+    "firelink_backend_call_duration_seconds",
+    "Latency of calls to Kubernetes, Prometheus and bonfire",
+    ("backend", "operation"))
+BACKEND_CALL_ERRORS = Counter(
+    "firelink_backend_call_errors_total",
+    "Calls to Kubernetes, Prometheus and bonfire that raised",
+    ("backend", "operation"))
+SOCKETIO_CONNECTIONS = Gauge(
+    "firelink_socketio_connections",
+    "Socket.IO clients currently connected")
+SOCKETIO_CONNECTS = Counter(
+    "firelink_socketio_connects_total",
+    "Socket.IO connections accepted")
+
+@contextmanager
+def track_backend(backend, operation):
+    """Time a backend call, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        BACKEND_CALL_ERRORS.labels(backend, operation).inc()
+        raise
+    finally:
+        BACKEND_CALL_DURATION.labels(backend, operation).observe(time.perf_counter() - start)
+
+def instrument_backend(backend, operation, func):
+    """Wrap func so every call is tracked as a backend call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track_backend(backend, operation):
+            return func(*args, **kwargs)
+    return wrapper
+
+def cache_metrics(caches):
+    """Register request and hit ratio metrics for caches exposing hits and misses in stats()
+
+    caches maps a cache name to a function returning its stats.
+    """
+    def requests():
+        values = {}
+        for name, stats in caches.items():
+            current = stats()
+            values[(name, "hit")] = current["hits"]
+            values[(name, "miss")] = current["misses"]
+        return values
+
+    def ratios():
+        values = {}
+        for name, stats in caches.items():
+            current = stats()
+            total = current["hits"] + current["misses"]
+            values[(name,)] = current["hits"] / total if total else 0.0
+        return values
+
+    CallbackMetric("firelink_cache_requests_total", "Cache lookups by result",
+        "counter", ("cache", "result"), requests)
+    CallbackMetric("firelink_cache_hit_ratio", "Share of cache lookups that were hits",
+        "gauge", ("cache",), ratios)
+
+def instrument_flask(app):
+    """Record latency and in-flight requests for every Flask route"""
+    from flask import g, request, request_started, request_finished, request_tearing_down
+
+    def started(sender, **extra):
+        g.metrics_route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g.metrics_start = time.perf_counter()
+        g.metrics_status = 500
+        HTTP_REQUESTS_IN_FLIGHT.labels(g.metrics_route).inc()
+
+    def finished(sender, response, **extra):
+        g.metrics_status = response.status_code
+
+    def tearing_down(sender, **extra):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return
+        route = g.metrics_route
+        HTTP_REQUESTS_IN_FLIGHT.labels(route).dec()
+        HTTP_REQUEST_DURATION.labels(route, request.method, g.metrics_status).observe(time.perf_counter() - start)
+
+    request_started.connect(started, app, weak=False)
+    request_finished.connect(finished, app, weak=False)
+    request_tearing_down.connect(tearing_down, app, weak=False)
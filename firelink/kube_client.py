@@ -0,0 +1,105 @@
+"""Process-wide Kubernetes API client shared by every request"""
+import os
+import threading
+import time
+import kubernetes
+from firelink.instrumentation import track_backend
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_kube_client_registry():
+    """Get the process-wide Kubernetes client registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = KubeClientRegistry()
+        return _registry
+
+class KubeClientRegistry:
+    """Loads the cluster config once and shares one pooled ApiClient.
+
+    The kubeconfig (as written by `oc login`) is preferred, falling back to the
+    in-cluster service account. The config is only reloaded when the kubeconfig
+    or service account token file changes, which keeps the urllib3 connection
+    pool alive across requests.
+    """
+    DEFAULT_POOL_SIZE = 20
+    DEFAULT_CHECK_INTERVAL = 5
+    IN_CLUSTER_TOKEN_FILE = "/var/run/secrets/kubernetes.io/serviceaccount/token"
+
+    def __init__(self):
+        self.pool_size = int(os.getenv("KUBE_POOL_SIZE", str(self.DEFAULT_POOL_SIZE)))
+        self.check_interval = float(os.getenv("KUBE_CONFIG_CHECK_INTERVAL", str(self.DEFAULT_CHECK_INTERVAL)))
+        self._lock = threading.Lock()
+        self._api_client = None
+        self._config_stamp = None
+        self._checked_at = 0
+        self.loads = 0
+
+    def api_client(self):
+        """Get the shared ApiClient, reloading the config if its source changed"""
+        with self._lock:
+            now = time.monotonic()
+            if self._api_client is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                stamp = self._current_config_stamp()
+                if self._api_client is None or stamp != self._config_stamp:
+                    self._api_client = self._load(stamp)
+                    self._config_stamp = stamp
+            return self._api_client
+
+    def core_v1(self):
+        """CoreV1Api on the shared client"""
+        return kubernetes.client.CoreV1Api(self.api_client())
+
+    def custom_objects(self):
+        """CustomObjectsApi on the shared client"""
+        return kubernetes.client.CustomObjectsApi(self.api_client())
+
+    def version(self):
+        """VersionApi on the shared client"""
+        return kubernetes.client.VersionApi(self.api_client())
+
+    def stats(self):
+        """Config load counter and pool size"""
+        return {"pool_size": self.pool_size, "config_loads": self.loads}
+
+    def _kubeconfig_path(self):
+        for path in os.getenv("KUBECONFIG", kubernetes.config.KUBE_CONFIG_DEFAULT_LOCATION).split(os.pathsep):
+            path = os.path.expanduser(path)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _current_config_stamp(self):
+        path = self._kubeconfig_path()
+        if path is not None:
+            return ("kubeconfig", path, os.stat(path).st_mtime_ns)
+        if os.path.exists(self.IN_CLUSTER_TOKEN_FILE):
+            return ("incluster", self.IN_CLUSTER_TOKEN_FILE, os.stat(self.IN_CLUSTER_TOKEN_FILE).st_mtime_ns)
+        return None
+
+    def _load(self, stamp):
+        configuration = kubernetes.client.Configuration()
+        if stamp is not None and stamp[0] == "kubeconfig":
+            kubernetes.config.load_kube_config(config_file=stamp[1], client_configuration=configuration)
+        else:
+            kubernetes.config.load_incluster_config(client_configuration=configuration)
+        configuration.connection_pool_maxsize = self.pool_size
+        self.loads += 1
+        return InstrumentedApiClient(configuration)
+
+class InstrumentedApiClient(kubernetes.client.ApiClient):
+    """ApiClient that records the latency and errors of every API call.
+
+    Calls are labelled with the method and the path template, so for example
+    every namespace list is "GET /api/v1/namespaces". Watches only cover the
+    time taken to open the stream.
+    """
+    def call_api(self, resource_path, method, path_params=None, query_params=None, *args, **kwargs):
+        operation = f"{method} {resource_path}"
+        if ("watch", True) in (query_params or []):
+            operation += " (watch)"
+        with track_backend("kubernetes", operation):
+            return super().call_api(resource_path, method, path_params, query_params, *args, **kwargs)
@@ -1,7 +1,9 @@
 """Module to handle Prometheus queries for cluster, pod, and namespace metrics."""
 import os
 import warnings
-from prometheus_api_client import PrometheusConnect
+import gevent
+from firelink.prometheus_client import get_prometheus_client
+from firelink.singleflight import get_singleflight
 from urllib3.exceptions import InsecureRequestWarning
 import urllib3
 
@@ -64,16 +66,30 @@ class CPUQueries:
     def usage(self, namespaces):
         return f'sum(rate(container_cpu_usage_seconds_total{{namespace=~"{namespaces}",container!="POD"}}[5m])) by (namespace)'
 
+class CombinedQueries:
+    """Class to hold a single Prometheus query covering every namespace resource metric."""
+    KINDS = ("limits", "requests", "usage")
+
+    def resources(self, namespaces):
+        """Union of the CPU and memory limits, requests and usage queries.
+
+        Each series is tagged with "kind" and "resource" labels using label_replace
+        so the series survive the "or" union and can be told apart afterwards.
+        """
+        tagged = []
+        for resource, queries in (("cpu", CPUQueries()), ("memory", MemoryQueries())):
+            for kind in self.KINDS:
+                query = getattr(queries, kind)(namespaces)
+                tagged.append(
+                    f'label_replace(label_replace({query}, "kind", "{kind}", "", ""), '
+                    f'"resource", "{resource}", "", "")'
+                )
+        return " or ".join(tagged)
+
 class PrometheusClusterMetrics:
     """Class to handle Prometheus queries for cluster metrics."""
     def __init__(self):
-        prometheus_url = os.getenv("PROMETHEUS_URL")
-        bearer_token = os.getenv("OC_TOKEN")
-        self.prometheus_api = PrometheusConnect(
-            url=prometheus_url,
-            headers={"Authorization": f"Bearer {bearer_token}"},
-            disable_ssl=True
-        )
+        self.prometheus_api = get_prometheus_client()
 
     def cluster_cpu_usage(self):
         """Get the cluster CPU usage."""
@@ -177,13 +193,7 @@ class PrometheusPodMetrics:
     """Class to handle Prometheus queries for pod metrics."""
     
     def __init__(self):
-        prometheus_url = os.getenv("PROMETHEUS_URL")
-        bearer_token = os.getenv("OC_TOKEN")
-        self.prometheus_api = PrometheusConnect(
-            url=prometheus_url,
-            headers={"Authorization": f"Bearer {bearer_token}"},
-            disable_ssl=True
-        )
+        self.prometheus_api = get_prometheus_client()
 
     def top_pods(self, namespace):
         """Get the top pods for a namespace by CPU and memory usage."""
@@ -224,99 +234,150 @@ class PrometheusPodMetrics:
             
 class PrometheusNamespaceMetrics:
     """Class to handle Prometheus queries for namespace metrics."""
+    DEFAULT_QUERY_TIMEOUT = 10
 
     def __init__(self):
-        prometheus_url = os.getenv("PROMETHEUS_URL")
-        bearer_token = os.getenv("OC_TOKEN")
-        self.prometheus_api = PrometheusConnect(url=prometheus_url,headers={"Authorization": f"Bearer {bearer_token}"},disable_ssl=True)
+        self.query_timeout = float(os.getenv("PROMETHEUS_QUERY_TIMEOUT", str(self.DEFAULT_QUERY_TIMEOUT)))
+        self.prometheus_api = get_prometheus_client()
 
     def _run_query(self, query):
         """Run a Prometheus query and return the results."""
         try:
-            results = self.prometheus_api.custom_query(query=query)
+            results = self.prometheus_api.custom_query(query=query, timeout=self.query_timeout)
             return results
         except Exception as e:
             print(f"Error running query: {e}")
             return None
 
-    def get_resources_for_namespace(self, namespace):
-        """Get resources for a single namespace."""
-        # Generate batched queries
-        cpu_limits = self._run_query(CPUQueries().limits(namespace))
-        cpu_requests = self._run_query(CPUQueries().requests(namespace))
-        cpu_usage = self._run_query(CPUQueries().usage(namespace)) 
-        memory_limits = self._run_query(MemoryQueries().limits(namespace))
-        memory_requests = self._run_query(MemoryQueries().requests(namespace))
-        memory_usage = self._run_query(MemoryQueries().usage(namespace))
-
-        # Process the results
-        resources = {
+    def _run_queries(self, queries):
+        """Run named Prometheus queries concurrently and return the results by name.
+
+        Queries run in their own greenlets, so under the gevent worker the total
+        latency is that of the slowest query rather than the sum of all of them.
+        A query that fails or doesn't finish within the timeout maps to None and
+        the other results are still returned.
+        """
+        greenlets = {name: gevent.spawn(self._run_query, query) for name, query in queries.items()}
+        gevent.joinall(list(greenlets.values()), timeout=self.query_timeout)
+        results = {}
+        for name, greenlet in greenlets.items():
+            if greenlet.ready():
+                results[name] = greenlet.value
+            else:
+                print(f"Query timed out after {self.query_timeout}s: {name}")
+                greenlet.kill(block=False)
+                results[name] = None
+        return results
+
+    def _namespace_queries(self, namespaces):
+        """Build the CPU and memory limits, requests and usage queries for a namespace pattern."""
+        cpu_queries = CPUQueries()
+        memory_queries = MemoryQueries()
+        return {
+            'cpu_limits': cpu_queries.limits(namespaces),
+            'cpu_requests': cpu_queries.requests(namespaces),
+            'cpu_usage': cpu_queries.usage(namespaces),
+            'memory_limits': memory_queries.limits(namespaces),
+            'memory_requests': memory_queries.requests(namespaces),
+            'memory_usage': memory_queries.usage(namespaces),
+        }
+
+    def _build_resources(self, values, namespace):
+        """Map the indexed query values for a namespace into limits, requests and usage.
+
+        A namespace without series in a query that answered gets 0.0, while a
+        query that failed or timed out is reported as None.
+        """
+        def value(name):
+            return None if values[name] is None else values[name].get(namespace, 0.0)
+        return {
             'limits': {
-                'cpu': self._extract_cpu_value(cpu_limits, namespace), 
-                'memory': self._extract_memory_value(memory_limits, namespace)
+                'cpu': value('cpu_limits'),
+                'memory': value('memory_limits')
             },
             'requests': {
-                'cpu': self._extract_cpu_value(cpu_requests, namespace),
-                'memory': self._extract_memory_value(memory_requests, namespace)
+                'cpu': value('cpu_requests'),
+                'memory': value('memory_requests')
             },
             'usage': {
-                'cpu': self._extract_cpu_value(cpu_usage, namespace),
-                'memory': self._extract_memory_value(memory_usage, namespace)
+                'cpu': value('cpu_usage'),
+                'memory': value('memory_usage')
             }
         }
 
-        return resources
+    def _index_results(self, results):
+        """Convert each named query result into a namespace to value map, or None if the query failed."""
+        return {
+            name: None if result is None
+            else self._extract_cpu_values(result) if name.startswith('cpu_')
+            else self._extract_memory_values(result)
+            for name, result in results.items()
+        }
+
+    def _run_combined_query(self, namespaces):
+        """Run the single combined query and split its vector back into the named results."""
+        results = {name: [] for name in self._namespace_queries(namespaces)}
+        combined = self._run_query(CombinedQueries().resources(namespaces))
+        if combined is None:
+            return {name: None for name in results}
+        for series in combined:
+            metric = series["metric"]
+            name = f"{metric.get('resource')}_{metric.get('kind')}"
+            if name in results:
+                results[name].append(series)
+        return results
+
+    def _run_namespace_queries(self, namespaces, combined):
+        if combined:
+            return get_singleflight().do(
+                ("namespace_resource_metrics", namespaces, combined),
+                self._run_combined_query, namespaces)
+        return get_singleflight().do(
+            ("namespace_resource_metrics", namespaces, combined),
+            self._run_queries, self._namespace_queries(namespaces))
+
+    def get_resources_for_namespace(self, namespace, combined=False):
+        """Get resources for a single namespace.
 
-    def get_resources_for_namespaces(self, namespaces):
-        """Get resources for a list of namespaces."""
+        With combined=True a single Prometheus query is sent instead of six.
+        """
+        values = self._index_results(self._run_namespace_queries(namespace, combined))
+        return self._build_resources(values, namespace)
+
+    def get_resources_for_namespaces(self, namespaces, combined=False):
+        """Get resources for a list of namespaces.
+
+        With combined=True a single Prometheus query is sent instead of six.
+        """
         # Create a regex pattern to match all the namespaces
         namespace_pattern = "|".join(namespaces)
-
-        # Generate batched queries
-        cpu_limits = self._run_query(CPUQueries().limits(namespace_pattern))
-        cpu_requests = self._run_query(CPUQueries().requests(namespace_pattern))
-        cpu_usage = self._run_query(CPUQueries().usage(namespace_pattern))
-        memory_limits = self._run_query(MemoryQueries().limits(namespace_pattern))
-        memory_requests = self._run_query(MemoryQueries().requests(namespace_pattern))
-        memory_usage = self._run_query(MemoryQueries().usage(namespace_pattern))
+        values = self._index_results(self._run_namespace_queries(namespace_pattern, combined))
 
         # Process the results and map them back to each namespace
         all_resources = {}
         for namespace in namespaces:
-            all_resources[namespace] = {
-                'limits': {
-                    'cpu': self._extract_cpu_value(cpu_limits, namespace), 
-                    'memory': self._extract_memory_value(memory_limits, namespace)
-                },
-                'requests': {
-                    'cpu': self._extract_cpu_value(cpu_requests, namespace),
-                    'memory': self._extract_memory_value(memory_requests, namespace)
-                },
-                'usage': {
-                    'cpu': self._extract_cpu_value(cpu_usage, namespace),
-                    'memory': self._extract_memory_value(memory_usage, namespace)
-                }
-            }
+            all_resources[namespace] = self._build_resources(values, namespace)
 
         return all_resources
 
-    def _extract_cpu_value(self, query_result, namespace):
-        """Extract and convert CPU values for a specific namespace from the query result."""
-        for result in query_result:
-            if result["metric"]["namespace"] == namespace:
-                raw_value = float(result["value"][1])
-                # Convert millicores to cores if necessary (CPU requests/limits)
-                # CPU usage (rate) is already in cores, so no conversion needed
-                if 'm' in result["value"][1]:  # Only relevant if Prometheus returns millicores
-                    return raw_value / 1000
-                return raw_value  # already in cores or usage rate
-        return 0.0
-
-    def _extract_memory_value(self, query_result, namespace):
-        """Extract and convert memory values for a specific namespace from the query result."""
-        for result in query_result:
-            if result["metric"]["namespace"] == namespace:
-                raw_value = float(result["value"][1])
-                # Convert bytes to GB
-                return raw_value / (1024**2)
-        return 0.0
+    def _extract_cpu_values(self, query_result):
+        """Extract and convert CPU values for every namespace in the query result."""
+        values = {}
+        for result in query_result or []:
+            raw_value = result["value"][1]
+            # Convert millicores to cores if necessary (CPU requests/limits)
+            # CPU usage (rate) is already in cores, so no conversion needed
+            if raw_value.endswith('m'):  # Only relevant if Prometheus returns millicores
+                value = float(raw_value[:-1]) / 1000
+            else:
+                value = float(raw_value)  # already in cores or usage rate
+            values.setdefault(result["metric"]["namespace"], value)
+        return values
+
+    def _extract_memory_values(self, query_result):
+        """Extract and convert memory values for every namespace in the query result."""
+        values = {}
+        for result in query_result or []:
+            # Convert bytes to GB
+            values.setdefault(result["metric"]["namespace"], float(result["value"][1]) / (1024**2))
+        return values
@@ -0,0 +1,207 @@
+"""Push feed of namespace list changes for Socket.IO subscribers"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from firelink.namespace_informer import get_namespace_informer
+
+_feed = None
+
+def get_namespace_feed():
+    """Get the process-wide namespace feed, or None if it was never started"""
+    return _feed
+
+def start_namespace_feed(fetch_rows, emit):
+    """Start the process-wide namespace feed unless disabled via NAMESPACE_FEED_ENABLED"""
+    global _feed
+    if os.getenv("NAMESPACE_FEED_ENABLED", "true").lower() != "true":
+        return None
+    if _feed is None:
+        _feed = NamespaceFeed(fetch_rows, emit)
+        _feed.start()
+    return _feed
+
+class NamespaceFeed:
+    """Keeps the namespace list rows and streams what changed to subscribed sockets.
+
+    The informer's listeners mark the feed as changed, then after
+    NAMESPACE_FEED_DEBOUNCE seconds the rows are rebuilt and diffed against the
+    previous ones, so a burst of watch events goes out as one batch of add,
+    update and remove changes. Rows are also rebuilt every
+    NAMESPACE_FEED_RESYNC seconds in case a change was missed, or because
+    there is no informer to listen to.
+
+    Every batch gets the next version and a resume token. A client that falls
+    behind resubscribes with the last token it applied and receives the changes
+    it missed, as long as they are among the last NAMESPACE_FEED_HISTORY
+    batches; otherwise it gets a fresh snapshot.
+    """
+    ROOM = "namespace-list"
+    DELTA_EVENT = "namespace-list-delta"
+    ADD = "add"
+    UPDATE = "update"
+    REMOVE = "remove"
+    DEFAULT_DEBOUNCE_SECONDS = 0.5
+    DEFAULT_RESYNC_SECONDS = 30
+    DEFAULT_HISTORY = 100
+
+    def __init__(self, fetch_rows, emit):
+        self.fetch_rows = fetch_rows
+        self.emit = emit
+        self.debounce = float(os.getenv("NAMESPACE_FEED_DEBOUNCE", str(self.DEFAULT_DEBOUNCE_SECONDS)))
+        self.resync_interval = float(os.getenv("NAMESPACE_FEED_RESYNC", str(self.DEFAULT_RESYNC_SECONDS)))
+        # Versions only mean something within this process, tokens from elsewhere get a snapshot
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._rows = {}
+        self._history = deque(maxlen=int(os.getenv("NAMESPACE_FEED_HISTORY", str(self.DEFAULT_HISTORY))))
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._loaded = False
+        self._thread = None
+
+    def start(self):
+        """Listen to the namespace informer and rebuild rows in the background"""
+        if self._thread is not None:
+            return
+        informer = get_namespace_informer()
+        if informer is not None:
+            informer.add_namespace_listener(self.notify)
+            informer.add_reservation_listener(self.notify)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Mark the rows as changed so the next batch picks them up"""
+        self._changed.set()
+
+    def token(self, version):
+        """Resume token for a version of this feed"""
+        return f"{self.epoch}:{version}"
+
+    def parse_token(self, token):
+        """Get the version a token of this feed refers to, or None if it can't be resumed from here"""
+        epoch, _, version = str(token or "").partition(":")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        version = int(version)
+        return version if version <= self.version else None
+
+    def snapshot(self):
+        """Every row with the version and resume token it corresponds to"""
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                "type": "snapshot",
+                "version": self.version,
+                "resume_token": self.token(self.version),
+                "namespaces": list(self._rows.values()),
+            }
+
+    def changes_since(self, token):
+        """Changes from the version a token refers to up to now, or None if they are no longer known"""
+        self._ensure_loaded()
+        with self._lock:
+            version = self.parse_token(token)
+            if version is None:
+                return None
+            if version < self.version and (not self._history or self._history[0][0] > version + 1):
+                return None
+            first_ops = {}
+            for batch_version, changes in self._history:
+                if batch_version <= version:
+                    continue
+                for change in changes:
+                    first_ops.setdefault(change["namespace"], change["op"])
+            changes = []
+            for name, first_op in first_ops.items():
+                row = self._rows.get(name)
+                if row is None:
+                    changes.append({"op": self.REMOVE, "namespace": name})
+                else:
+                    changes.append({"op": self.ADD if first_op == self.ADD else self.UPDATE,
+                        "namespace": name, "row": row})
+            return {
+                "type": "delta",
+                "version": self.version,
+                "resume_token": self.token(self.version),
+                "previous_token": self.token(version),
+                "changes": changes,
+            }
+
+    def resume(self, token=None):
+        """What a subscriber needs to catch up: the changes since its token, or a snapshot"""
+        if token:
+            delta = self.changes_since(token)
+            if delta is not None:
+                return delta
+        return self.snapshot()
+
+    def refresh(self):
+        """Rebuild the rows, diff them against the previous ones and publish the changes"""
+        with self._refresh_lock:
+            rows = {row["namespace"]: row for row in self.fetch_rows()}
+            with self._lock:
+                changes = self._diff(self._rows, rows)
+                self._loaded = True
+                if not changes:
+                    return None
+                previous = self.version
+                self.version += 1
+                self._rows = rows
+                self._history.append((self.version, changes))
+                delta = {
+                    "type": "delta",
+                    "version": self.version,
+                    "resume_token": self.token(self.version),
+                    "previous_token": self.token(previous),
+                    "changes": changes,
+                }
+            try:
+                # Each worker and replica runs its own feed, so its deltas only go to its own sockets
+                self.emit(self.DELTA_EVENT, delta, to=self.ROOM, ignore_queue=True)
+            except Exception as e:
+                print(f"Failed to send namespace list changes: {e}")
+            return delta
+
+    def stats(self):
+        """Current version, row count and retained history"""
+        with self._lock:
+            return {
+                "version": self.version,
+                "namespaces": len(self._rows),
+                "history": len(self._history),
+            }
+
+    def _diff(self, old, new):
+        changes = []
+        for name, row in new.items():
+            previous = old.get(name)
+            if previous is None:
+                changes.append({"op": self.ADD, "namespace": name, "row": row})
+            elif previous != row:
+                changes.append({"op": self.UPDATE, "namespace": name, "row": row})
+        for name in old:
+            if name not in new:
+                changes.append({"op": self.REMOVE, "namespace": name})
+        return changes
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.refresh()
+
+    def _run(self):
+        while True:
+            if self._changed.wait(self.resync_interval):
+                # Let the rest of a burst of watch events arrive before diffing
+                time.sleep(self.debounce)
+            elif not self._loaded:
+                # Nobody has asked for the rows yet, so there is nothing to resync
+                continue
+            self._changed.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Namespace feed refresh failed: {e}")
@@ -0,0 +1,258 @@
+"""Background informer that keeps an in-memory index of ephemeral namespaces and reservations"""
+import os
+import threading
+import time
+import kubernetes
+from kubernetes.client.rest import ApiException
+
+_informer = None
+
+class NamespaceRecord:
+    """The namespace fields firelink uses, read straight from the API server's JSON"""
+    __slots__ = ("name", "phase", "labels", "resource_version")
+
+    def __init__(self, name, phase, labels, resource_version):
+        self.name = name
+        self.phase = phase
+        self.labels = labels
+        self.resource_version = resource_version
+
+    @classmethod
+    def from_dict(cls, raw):
+        """Build a record from a namespace as returned by the API server"""
+        metadata = raw.get("metadata") or {}
+        return cls(
+            name=metadata.get("name"),
+            phase=(raw.get("status") or {}).get("phase"),
+            labels=metadata.get("labels") or {},
+            resource_version=metadata.get("resourceVersion"))
+
+def reservation_namespace(reservation):
+    """Get the namespace a reservation holds, or None while it is still pending"""
+    return (reservation.get("status") or {}).get("namespace")
+
+def index_reservations_by_namespace(reservations):
+    """Build a lookup of reservations keyed by the namespace they hold"""
+    index = {}
+    for reservation in reservations:
+        namespace = reservation_namespace(reservation)
+        if namespace:
+            index[namespace] = reservation
+    return index
+
+def get_namespace_informer():
+    """Get the process-wide namespace informer, or None if it was never started"""
+    return _informer
+
+def start_namespace_informer(resources_factory):
+    """Start the process-wide namespace informer unless disabled via NAMESPACE_INFORMER_ENABLED"""
+    global _informer
+    if os.getenv("NAMESPACE_INFORMER_ENABLED", "true").lower() != "true":
+        return None
+    if _informer is None:
+        _informer = NamespaceInformer(resources_factory)
+        _informer.start()
+    return _informer
+
+class RawWatch(kubernetes.watch.Watch):
+    """Watch yielding objects as the API server's JSON instead of deserialized models.
+
+    Watch.stream(deserialize=False) skips setting raw_object, which its own
+    ERROR event handling reads, so a 410 Gone would surface as a KeyError.
+    """
+    def unmarshal_event(self, data, return_type):
+        return super().unmarshal_event(data, None)
+
+class NamespaceInformer:
+    """Lists namespaces and reservations once, then follows them with the watch API.
+
+    Each resource is handled by its own background loop. A loop lists the resource,
+    replaces its part of the index, then watches from the list's resourceVersion.
+    Every list and watch builds the API resources again from the client
+    registry, so the loops move to the new ApiClient after a re-login.
+    When the watch window expires the loop resumes from the last seen resourceVersion,
+    and when the API server answers 410 Gone it relists from scratch.
+    """
+    HTTP_GONE = 410
+    DEFAULT_WATCH_TIMEOUT_SECONDS = 300
+    DEFAULT_RETRY_WAIT_SECONDS = 5
+
+    def __init__(self, resources_factory):
+        self.resources_factory = resources_factory
+        self.watch_timeout = int(os.getenv(
+            "NAMESPACE_INFORMER_WATCH_TIMEOUT", str(self.DEFAULT_WATCH_TIMEOUT_SECONDS)))
+        self.retry_wait = int(os.getenv(
+            "NAMESPACE_INFORMER_RETRY_WAIT", str(self.DEFAULT_RETRY_WAIT_SECONDS)))
+        self._lock = threading.Lock()
+        self._namespaces = {}
+        self._reservations = {}
+        self._reservations_by_namespace = {}
+        self._namespaces_synced = threading.Event()
+        self._reservations_synced = threading.Event()
+        self._threads = []
+        self._reservation_listeners = []
+        self._namespace_listeners = []
+
+    def start(self):
+        """Start the namespace and reservation watch loops in the background"""
+        if self._threads:
+            return
+        for target in (self._run_namespaces, self._run_reservations):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def synced(self):
+        """True once both namespaces and reservations have been listed at least once"""
+        return self._namespaces_synced.is_set() and self._reservations_synced.is_set()
+
+    def wait_for_sync(self, timeout=None):
+        """Block until the informer has synced or the timeout expires"""
+        return (self._namespaces_synced.wait(timeout)
+            and self._reservations_synced.wait(timeout))
+
+    def namespaces(self):
+        """Snapshot of the indexed ephemeral namespaces"""
+        with self._lock:
+            return list(self._namespaces.values())
+
+    def reservations(self):
+        """Snapshot of the indexed namespace reservations"""
+        with self._lock:
+            return list(self._reservations.values())
+
+    def get_namespace(self, name):
+        """Get an indexed ephemeral namespace by name"""
+        with self._lock:
+            return self._namespaces.get(name)
+
+    def reservations_by_namespace(self):
+        """Snapshot of the indexed reservations keyed by the namespace they hold"""
+        with self._lock:
+            return dict(self._reservations_by_namespace)
+
+    def get_reservation_for_namespace(self, name):
+        """Get the reservation holding a namespace, if any"""
+        with self._lock:
+            return self._reservations_by_namespace.get(name)
+
+    def add_reservation_listener(self, listener):
+        """Call listener() from the informer thread whenever the reservation index changes"""
+        with self._lock:
+            self._reservation_listeners.append(listener)
+
+    def add_namespace_listener(self, listener):
+        """Call listener() from the informer thread whenever the namespace index changes"""
+        with self._lock:
+            self._namespace_listeners.append(listener)
+
+    def _notify_reservation_listeners(self):
+        self._notify(self._reservation_listeners, "reservation")
+
+    def _notify_namespace_listeners(self):
+        self._notify(self._namespace_listeners, "namespace")
+
+    def _notify(self, listeners, kind):
+        with self._lock:
+            listeners = list(listeners)
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"Namespace informer {kind} listener failed: {e}")
+
+    def _get_resources(self):
+        # Built again for every list and watch so clients replaced after a re-login are picked up
+        return self.resources_factory()
+
+    def _run_namespaces(self):
+        self._run(self._list_namespaces, self._watch_namespaces)
+
+    def _run_reservations(self):
+        self._run(self._list_reservations, self._watch_reservations)
+
+    def _run(self, list_func, watch_func):
+        while True:
+            try:
+                resource_version = list_func()
+                while resource_version is not None:
+                    resource_version = watch_func(resource_version)
+            except ApiException as e:
+                if e.status != self.HTTP_GONE:
+                    print(f"Namespace informer watch failed: {e}")
+                    time.sleep(self.retry_wait)
+            except Exception as e:
+                print(f"Namespace informer failed, relisting: {e}")
+                time.sleep(self.retry_wait)
+
+    def _list_namespaces(self):
+        resources = self._get_resources()
+        records, resource_version = resources.list_namespaces()
+        namespaces = {ns.name: ns for ns in records if resources.is_ephemeral_namespace(ns)}
+        with self._lock:
+            self._namespaces = namespaces
+        self._namespaces_synced.set()
+        self._notify_namespace_listeners()
+        return resource_version
+
+    def _list_reservations(self):
+        response = self._get_resources().list_reservations()
+        reservations = {res["metadata"]["name"]: res for res in response["items"]}
+        reservations_by_namespace = index_reservations_by_namespace(reservations.values())
+        with self._lock:
+            self._reservations = reservations
+            self._reservations_by_namespace = reservations_by_namespace
+        self._reservations_synced.set()
+        self._notify_reservation_listeners()
+        return response["metadata"]["resourceVersion"]
+
+    def _watch_namespaces(self, resource_version):
+        resources = self._get_resources()
+        watch = RawWatch()
+        # Namespaces leaving the selectors (e.g. starting to terminate) arrive as DELETED
+        for event in watch.stream(
+            resources.k8s_client.list_namespace,
+            label_selector=resources.NAMESPACE_LABEL_SELECTOR,
+            field_selector=resources.NAMESPACE_FIELD_SELECTOR,
+            resource_version=resource_version,
+            timeout_seconds=self.watch_timeout):
+            namespace = NamespaceRecord.from_dict(event["object"])
+            with self._lock:
+                if event["type"] != "DELETED" and resources.is_ephemeral_namespace(namespace):
+                    self._namespaces[namespace.name] = namespace
+                else:
+                    self._namespaces.pop(namespace.name, None)
+            self._notify_namespace_listeners()
+            resource_version = namespace.resource_version
+        return resource_version
+
+    def _watch_reservations(self, resource_version):
+        resources = self._get_resources()
+        watch = kubernetes.watch.Watch()
+        for event in watch.stream(
+            resources.crd_client.list_cluster_custom_object,
+            resources.RESERVATION_GROUP,
+            resources.RESERVATION_VERSION,
+            resources.RESERVATION_PLURAL,
+            resource_version=resource_version,
+            timeout_seconds=self.watch_timeout):
+            reservation = event["object"]
+            name = reservation["metadata"]["name"]
+            with self._lock:
+                self._unindex_reservation(name)
+                if event["type"] != "DELETED":
+                    self._reservations[name] = reservation
+                    namespace = reservation_namespace(reservation)
+                    if namespace:
+                        self._reservations_by_namespace[namespace] = reservation
+            self._notify_reservation_listeners()
+            resource_version = reservation["metadata"]["resourceVersion"]
+        return resource_version
+
+    def _unindex_reservation(self, name):
+        previous = self._reservations.pop(name, None)
+        if previous is None:
+            return
+        namespace = reservation_namespace(previous)
+        if self._reservations_by_namespace.get(namespace) is previous:
+            del self._reservations_by_namespace[namespace]
@@ -1,15 +1,19 @@
 """This module contains classes to interact with OpenShift resources"""
+import os
 import time
 import json
 from bonfire import bonfire
-import kubernetes
 from firelink.adaptor_class_helpers import AdaptorClassHelpers
+from firelink.kube_client import get_kube_client_registry
+from firelink.instrumentation import track_backend
+from firelink.namespace_informer import get_namespace_informer, index_reservations_by_namespace, NamespaceRecord
+from firelink.singleflight import get_singleflight
+from firelink.release_tracker import get_release_tracker
 
 class Node:
     """Class to get nodes in the cluster"""
     def __init__(self, jsonify=json.dumps):
-        kubernetes.config.load_kube_config()
-        self.k8s_client = kubernetes.client.CoreV1Api()
+        self.k8s_client = get_kube_client_registry().core_v1()
         self.jsonify = jsonify
 
     def get_nodes(self):
@@ -39,33 +43,71 @@ class Node:
 
 class EphemeralResources:
     """Class to get resources related to ephemeral such as namespaces and reservations"""
+    RESERVATION_GROUP = "cloud.redhat.com"
+    RESERVATION_VERSION = "v1alpha1"
+    RESERVATION_PLURAL = "namespacereservations"
+    NAMESPACE_PREFIX = "ephemeral-"
+    EXCLUDED_NAMESPACES = ("ephemeral-base", "ephemeral-namespace-operator-system")
+    NAMESPACE_LABEL_SELECTOR = "operator-ns"
+    NAMESPACE_FIELD_SELECTOR = "status.phase=Active"
+    DEFAULT_NAMESPACE_PAGE_SIZE = 500
+
     def __init__(self):
-        kubernetes.config.load_kube_config()
-        self.k8s_client = kubernetes.client.CoreV1Api()
-        self.crd_client = kubernetes.client.CustomObjectsApi()
+        clients = get_kube_client_registry()
+        self.k8s_client = clients.core_v1()
+        self.crd_client = clients.custom_objects()
+        self.namespace_page_size = int(os.getenv(
+            "NAMESPACE_LIST_PAGE_SIZE", str(self.DEFAULT_NAMESPACE_PAGE_SIZE)))
+
+    def is_ephemeral_namespace(self, namespace):
+        """Check if a namespace record is an active ephemeral pool namespace"""
+        return (namespace.name.startswith(self.NAMESPACE_PREFIX)
+            and bool(namespace.labels.get("operator-ns", False))
+            and namespace.phase == "Active"
+            and namespace.name not in self.EXCLUDED_NAMESPACES)
+
+    def list_namespaces(self):
+        """List the active operator namespaces as NamespaceRecords.
+
+        The label and phase filters are applied by the API server, results are
+        fetched in pages and the raw JSON is read without building client models.
+        Returns the records and the resourceVersion of the list.
+        """
+        records = []
+        continue_token = None
+        while True:
+            response = self.k8s_client.list_namespace(
+                label_selector=self.NAMESPACE_LABEL_SELECTOR,
+                field_selector=self.NAMESPACE_FIELD_SELECTOR,
+                limit=self.namespace_page_size,
+                _continue=continue_token,
+                _preload_content=False)
+            try:
+                page = json.loads(response.data)
+            finally:
+                response.release_conn()
+            records.extend(NamespaceRecord.from_dict(item) for item in page.get("items") or [])
+            continue_token = page["metadata"].get("continue")
+            if not continue_token:
+                return records, page["metadata"].get("resourceVersion")
+
+    def list_reservations(self, **kwargs):
+        """List namespace reservations, returning the full list response"""
+        return self.crd_client.list_cluster_custom_object(
+            group=self.RESERVATION_GROUP,
+            version=self.RESERVATION_VERSION,
+            plural=self.RESERVATION_PLURAL,
+            **kwargs
+        )
 
     def get_ephemeral_namespaces(self):
         """Get ephemeral namespaces"""
-        all_namespaces = self.k8s_client.list_namespace()
-        # Filter namespaces that start with "ephemeral-"
-        prefix = "ephemeral-"
-        namespaces = [ns for ns in all_namespaces.items 
-            if ns.metadata.name.startswith(prefix)
-            and bool(ns.metadata.labels.get("operator-ns", False))
-            and ns.status.phase == "Active"
-            and ns.metadata.name != "ephemeral-base"
-            and ns.metadata.name != "ephemeral-namespace-operator-system"
-            ]
-        return namespaces
+        records, _ = self.list_namespaces()
+        return [ns for ns in records if self.is_ephemeral_namespace(ns)]
 
     def get_reservations(self):
         """Get namespace reservations"""
-        reservations = self.crd_client.list_cluster_custom_object(
-            group="cloud.redhat.com",
-            version="v1alpha1",
-            plural="namespacereservations"
-        )
-        return reservations["items"]
+        return self.list_reservations()["items"]
 
 class Namespace:
     """Class to manage namespaces"""
@@ -90,41 +132,59 @@ class Namespace:
 
     def list(self):
         """List ephemeral namespaces"""
-        self.helpers.route_guard()
+        namespaces, reservations_by_namespace = self._list_snapshot()
+        # Sorted so every replica serves the same body, and with it the same ETag
+        response = [
+            self._project_namespace(namespace, reservations_by_namespace.get(namespace.name))
+            for namespace in sorted(namespaces, key=lambda namespace: namespace.name)
+        ]
+        return self.jsonify(response)
 
+    def _list_snapshot(self):
+        """Get the ephemeral namespaces and their reservations keyed by namespace name"""
+        informer = get_namespace_informer()
+        if informer is not None and informer.synced():
+            # A synced informer has already listed namespacereservations,
+            # so the reservation system is known to be available
+            return informer.namespaces(), informer.reservations_by_namespace()
+        return get_singleflight().do(("namespace_list",), self._fetch_snapshot)
+
+    def _fetch_snapshot(self):
+        self.helpers.route_guard()
         cluster = EphemeralResources()
         namespaces = cluster.get_ephemeral_namespaces()
         reservations = cluster.get_reservations()
-        response = []
+        return namespaces, index_reservations_by_namespace(reservations)
 
-        for namespace in namespaces:
-            response_obj = {
-                "namespace": namespace.metadata.name,
-                "status": namespace.status.phase,
+    def _project_namespace(self, namespace, reservation):
+        """Build the list response row for a namespace and its reservation, if any"""
+        if reservation is None:
+            return {
+                "namespace": namespace.name,
+                "status": namespace.phase,
                 "reserved": False,
-                "pool_type": namespace.metadata.labels["pool"],
+                "pool_type": namespace.labels["pool"],
                 "requester": "",
                 "expires_in": "",
                 "clowdapps": 0,
             }
-            # find the reservation for this namespace if there is one
-            for reservation in reservations:
-                if reservation["status"]["namespace"] == namespace.metadata.name:
-                    response_obj["reserved"] = True
-                    response_obj["requester"] = reservation["metadata"]["labels"]["requester"]
-                    response_obj["expires_in"] = reservation["status"]["expiration"]
-                    response_obj["pool_type"] = reservation["spec"]["pool"]
-                    #response_obj["clowdapps"] = reservation["spec"]["clowdapps"]
-
-            response.append(response_obj)
-
-        return self.jsonify(response)
+        return {
+            "namespace": namespace.name,
+            "status": namespace.phase,
+            "reserved": True,
+            "pool_type": reservation["spec"]["pool"],
+            "requester": reservation["metadata"]["labels"]["requester"],
+            "expires_in": reservation["status"]["expiration"],
+            "clowdapps": 0,
+        }
 
     def reserve(self, opts):
         """Reserve a namespace"""
         self.helpers.route_guard()
 
-        requester = opts.get("requester", bonfire._get_requester())
+        with track_backend("bonfire", "_get_requester"):
+            default_requester = bonfire._get_requester()
+        requester = opts.get("requester", default_requester)
         res_name = opts.get("name")
         duration = opts.get("duration", self.DEFAULT_DURATION)
         pool_type = opts.get("pool_type", self.DEFAULT_POOL_TYPE)
@@ -169,7 +229,12 @@ class Namespace:
 
         try:
             bonfire.release_reservation(None, namespace, opts.get("local", self.DEFAULT_LOCAL))
-            response = self._try_release_loop(namespace)
+            tracker = get_release_tracker()
+            if tracker is None:
+                response = self._try_release_loop(namespace)
+            else:
+                # Still pending, confirmation is delivered later through the tracker
+                response = tracker.track(namespace).to_dict()
         except Exception as e:
             response = {"completed": False, "message": str(e)}
 
@@ -177,7 +242,12 @@ class Namespace:
 
     def describe(self, namespace):
         """Describe a namespace"""
-        self.helpers.route_guard()
+        informer = get_namespace_informer()
+        # A synced informer has already listed namespacereservations, so the reservation
+        # system is known to be available. Namespaces it hasn't indexed, e.g. ones reserved
+        # moments ago or outside the ephemeral pools, are still described by bonfire
+        if informer is None or not informer.synced():
+            self.helpers.route_guard()
         try:
             descriptionText = bonfire.describe_namespace(namespace, "string")
             response = {
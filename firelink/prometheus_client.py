@@ -0,0 +1,103 @@
+"""Process-wide Prometheus client sharing one pooled keep-alive HTTP session"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from prometheus_api_client import PrometheusConnect
+from firelink.instrumentation import instrument_backend
+
+_factory = None
+_factory_lock = threading.Lock()
+
+def get_prometheus_client_factory():
+    """Get the process-wide Prometheus client factory"""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            _factory = PrometheusClientFactory()
+        return _factory
+
+def get_prometheus_client():
+    """Get the shared PrometheusConnect client"""
+    return get_prometheus_client_factory().client()
+
+class PrometheusClientFactory:
+    """Builds a single PrometheusConnect whose session is reused by every metrics request.
+
+    The session keeps connections to Prometheus alive in a pool, so requests after
+    the first skip the TCP and TLS handshakes. Failed requests are retried a bounded
+    number of times with exponential backoff.
+    """
+    DEFAULT_POOL_SIZE = 20
+    DEFAULT_CONNECT_TIMEOUT = 5
+    DEFAULT_READ_TIMEOUT = 30
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_RETRY_BACKOFF = 0.5
+    RETRY_ON_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self):
+        self.url = os.getenv("PROMETHEUS_URL")
+        self.bearer_token = os.getenv("OC_TOKEN")
+        self.pool_size = int(os.getenv("PROMETHEUS_POOL_SIZE", str(self.DEFAULT_POOL_SIZE)))
+        self.connect_timeout = float(os.getenv("PROMETHEUS_CONNECT_TIMEOUT", str(self.DEFAULT_CONNECT_TIMEOUT)))
+        self.read_timeout = float(os.getenv("PROMETHEUS_READ_TIMEOUT", str(self.DEFAULT_READ_TIMEOUT)))
+        self.max_retries = int(os.getenv("PROMETHEUS_MAX_RETRIES", str(self.DEFAULT_MAX_RETRIES)))
+        self.retry_backoff = float(os.getenv("PROMETHEUS_RETRY_BACKOFF", str(self.DEFAULT_RETRY_BACKOFF)))
+        self._lock = threading.Lock()
+        self._client = None
+        self._adapter = None
+
+    def client(self):
+        """Get the shared client, creating it on first use"""
+        with self._lock:
+            if self._client is None:
+                self._client = self._build_client()
+            return self._client
+
+    def _build_client(self):
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.retry_backoff,
+            status_forcelist=self.RETRY_ON_STATUS,
+        )
+        session = requests.Session()
+        session.verify = False
+        client = PrometheusConnect(
+            url=self.url,
+            headers={"Authorization": f"Bearer {self.bearer_token}"},
+            disable_ssl=True,
+            retry=retry,
+            session=session,
+            timeout=(self.connect_timeout, self.read_timeout),
+        )
+        # PrometheusConnect mounts an adapter with the default pool size for its URL,
+        # so replace it with one sized for concurrent queries
+        self._adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+        )
+        session.mount(self.url, self._adapter)
+        client.custom_query = instrument_backend("prometheus", "custom_query", client.custom_query)
+        return client
+
+    def stats(self):
+        """Connection reuse counters for the shared session"""
+        connections = 0
+        requests_sent = 0
+        if self._adapter is not None:
+            pools = self._adapter.poolmanager.pools
+            for key in pools.keys():
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        return {
+            "pool_size": self.pool_size,
+            "connections_opened": connections,
+            "requests": requests_sent,
+            "connections_reused": max(requests_sent - connections, 0),
+        }
@@ -0,0 +1,158 @@
+"""Background confirmation of namespace releases"""
+import os
+import threading
+import time
+import uuid
+from bonfire import bonfire
+from firelink.namespace_informer import get_namespace_informer
+
+_tracker = None
+
+def get_release_tracker():
+    """Get the process-wide release tracker, or None if it was never started"""
+    return _tracker
+
+def start_release_tracker(on_complete=None):
+    """Start the process-wide release tracker, calling on_complete(handle) when a release settles"""
+    global _tracker
+    if _tracker is None:
+        _tracker = ReleaseTracker(on_complete)
+    return _tracker
+
+class ReleaseHandle:
+    """Tracks one namespace release until it is confirmed or times out"""
+    PENDING = "pending"
+    RELEASED = "released"
+    TIMED_OUT = "timed_out"
+    FAILED = "failed"
+
+    def __init__(self, namespace):
+        self.id = uuid.uuid4().hex
+        self.namespace = namespace
+        self.status = self.PENDING
+        self.message = "Namespace release requested"
+        self.method = None
+        self.requested_at = time.time()
+        self.finished_at = None
+        self.changed = threading.Event()
+
+    def finished(self):
+        """True once the release was confirmed, failed or timed out"""
+        return self.status != self.PENDING
+
+    def to_dict(self):
+        """Release status as returned by the status API and Socket.IO"""
+        return {
+            "release_id": self.id,
+            "namespace": self.namespace,
+            "status": self.status,
+            "completed": self.status == self.RELEASED,
+            "message": self.message,
+            "method": self.method,
+            "requested_at": self.requested_at,
+            "finished_at": self.finished_at,
+        }
+
+class ReleaseTracker:
+    """Confirms namespace releases in the background.
+
+    When the namespace informer is synced, a release is confirmed as soon as its
+    watch drops the namespace's reservation. Otherwise bonfire.get_reservation is
+    polled with exponential backoff. Either way a release that isn't confirmed
+    within RELEASE_CONFIRM_TIMEOUT seconds is reported as timed out.
+    """
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_POLL_INITIAL_SECONDS = 0.5
+    DEFAULT_POLL_MAX_SECONDS = 8
+    DEFAULT_RETENTION_SECONDS = 3600
+
+    def __init__(self, on_complete=None):
+        self.on_complete = on_complete
+        self.timeout = float(os.getenv("RELEASE_CONFIRM_TIMEOUT", str(self.DEFAULT_TIMEOUT)))
+        self.poll_initial = float(os.getenv(
+            "RELEASE_POLL_INITIAL_SECONDS", str(self.DEFAULT_POLL_INITIAL_SECONDS)))
+        self.poll_max = float(os.getenv("RELEASE_POLL_MAX_SECONDS", str(self.DEFAULT_POLL_MAX_SECONDS)))
+        self.retention = float(os.getenv("RELEASE_RETENTION", str(self.DEFAULT_RETENTION_SECONDS)))
+        self._lock = threading.Lock()
+        self._handles = {}
+        self._listening_to = None
+
+    def track(self, namespace):
+        """Start confirming a release that was just requested. Returns its handle."""
+        handle = ReleaseHandle(namespace)
+        with self._lock:
+            self._prune()
+            self._handles[handle.id] = handle
+        threading.Thread(target=self._confirm, args=(handle,), daemon=True).start()
+        return handle
+
+    def get(self, release_id):
+        """Look up a release by ID"""
+        with self._lock:
+            return self._handles.get(release_id)
+
+    def _confirm(self, handle):
+        try:
+            informer = get_namespace_informer()
+            if informer is not None and informer.synced():
+                handle.method = "watch"
+                released = self._wait_for_watch(handle, informer)
+            else:
+                handle.method = "poll"
+                released = self._poll(handle)
+            if released:
+                handle.status, handle.message = ReleaseHandle.RELEASED, "Namespace released"
+            else:
+                handle.status, handle.message = (ReleaseHandle.TIMED_OUT,
+                    "Something went wrong verifying the release")
+        except Exception as e:
+            handle.status, handle.message = ReleaseHandle.FAILED, str(e)
+        handle.finished_at = time.time()
+        if self.on_complete is not None:
+            try:
+                self.on_complete(handle)
+            except Exception as e:
+                print(f"Failed to report release of {handle.namespace}: {e}")
+
+    def _wait_for_watch(self, handle, informer):
+        self._listen(informer)
+        deadline = time.monotonic() + self.timeout
+        while informer.get_reservation_for_namespace(handle.namespace) is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            handle.changed.wait(remaining)
+            handle.changed.clear()
+        return True
+
+    def _poll(self, handle):
+        deadline = time.monotonic() + self.timeout
+        wait = self.poll_initial
+        while True:
+            if bonfire.get_reservation(None, handle.namespace, None) is None:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+            wait = min(wait * 2, self.poll_max)
+
+    def _listen(self, informer):
+        with self._lock:
+            if self._listening_to is informer:
+                return
+            self._listening_to = informer
+        informer.add_reservation_listener(self._reservations_changed)
+
+    def _reservations_changed(self):
+        with self._lock:
+            pending = [handle for handle in self._handles.values() if not handle.finished()]
+        for handle in pending:
+            handle.changed.set()
+
+    def _prune(self):
+        """Forget settled releases past their retention. Caller holds the lock."""
+        cutoff = time.time() - self.retention
+        for release_id in [release_id for release_id, handle in self._handles.items()
+                if handle.finished_at is not None and handle.finished_at < cutoff]:
+            del self._handles[release_id]
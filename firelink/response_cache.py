@@ -0,0 +1,177 @@
+"""Per-endpoint TTL caching of read endpoint responses"""
+import os
+import json
+import time
+import zlib
+import hashlib
+import functools
+from flask import request, make_response, Response
+
+class ResponseCache:
+    """Caches read endpoint responses in a cache tier.
+
+    The tier is either this process's Flask-Caching instance or a store shared
+    by every replica (see firelink.cache_backends). Cache keys include the
+    endpoint name, the query string and the request body, so POST endpoints
+    such as top_pods get one entry per namespace. Keys are prefixed with the
+    payload format version so replicas running different formats never read
+    each other's entries.
+
+    Entries can belong to groups. Every group has a generation that is part of
+    the key, and invalidating a group moves it to a new generation so the old
+    entries are no longer read and simply expire.
+
+    Endpoints cached with etag=True answer with an ETag derived from the body,
+    so it is the same on every replica, and with 304 Not Modified when the
+    request's If-None-Match still matches. The ETag is stored with the entry so
+    cache hits don't hash the body again.
+    """
+    NAMESPACES_GROUP = "namespaces"
+    FORMAT_VERSION = 1
+    COMPRESSED = b"z"
+    UNCOMPRESSED = b"r"
+    DEFAULT_COMPRESS_MIN_BYTES = 1024
+    DEFAULT_TTLS = {
+        "cluster_top_nodes": 30,
+        "cluster_cpu_usage": 15,
+        "cluster_memory_usage": 15,
+        "namespace_list": 5,
+        "namespace_resource_metrics": 15,
+        "namespace_top_pods": 15,
+    }
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.key_prefix = f"firelink:v{self.FORMAT_VERSION}:response"
+        self.compress_min_bytes = int(os.getenv(
+            "CACHE_COMPRESS_MIN_BYTES", str(self.DEFAULT_COMPRESS_MIN_BYTES)))
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def ttl(self, name):
+        """TTL in seconds for an endpoint, overridable with CACHE_TTL_<NAME>. Zero disables caching."""
+        default = self.DEFAULT_TTLS.get(name, 0)
+        return int(os.getenv(f"CACHE_TTL_{name.upper()}", str(default)))
+
+    def cached(self, name, groups=(), etag=False):
+        """Decorator caching a view's successful responses for the endpoint's TTL.
+
+        With etag=True responses carry an ETag and honour If-None-Match.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                ttl = self.ttl(name)
+                if ttl <= 0:
+                    response = make_response(view(*args, **kwargs))
+                    return self.conditional(response) if etag else response
+                key = self._make_key(name, groups)
+                entry = self._get(key)
+                if entry is not None:
+                    self.hits += 1
+                    response = Response(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+                    return self.conditional(response, entry.get("etag")) if etag else response
+                self.misses += 1
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    entry = {
+                        "body": response.get_data(),
+                        "status": response.status_code,
+                        "mimetype": response.mimetype,
+                    }
+                    if etag:
+                        entry["etag"] = self.etag(entry["body"])
+                    self._set(key, entry, ttl)
+                if etag:
+                    return self.conditional(response, entry["etag"] if entry else None)
+                return response
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def etag(body):
+        """Content version of a response body"""
+        return hashlib.sha256(body).hexdigest()[:32]
+
+    def conditional(self, response, etag=None):
+        """Tag a successful response with an ETag, answering 304 if the client already has it"""
+        response = make_response(response)
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag or self.etag(response.get_data()))
+        # Browsers may keep the body but must check it is still current before using it
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def invalidate(self, group):
+        """Drop every cached response in a group"""
+        try:
+            self.backend.set(self._generation_key(group), str(time.time_ns()).encode(), 0)
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to invalidate cache group {group}: {e}")
+
+    def stats(self):
+        """Hit, miss and backend error counters"""
+        return {"backend": self.backend.name, "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+    def serialize(self, entry):
+        """Pack a cached response into bytes, compressing large bodies"""
+        header = {"status": entry["status"], "mimetype": entry["mimetype"]}
+        if entry.get("etag"):
+            header["etag"] = entry["etag"]
+        header = json.dumps(header).encode()
+        payload = header + b"\n" + entry["body"]
+        if len(payload) >= self.compress_min_bytes:
+            return self.COMPRESSED + zlib.compress(payload)
+        return self.UNCOMPRESSED + payload
+
+    def deserialize(self, data):
+        """Unpack bytes produced by serialize()"""
+        payload = zlib.decompress(data[1:]) if data[:1] == self.COMPRESSED else data[1:]
+        header, body = payload.split(b"\n", 1)
+        entry = json.loads(header)
+        entry["body"] = body
+        return entry
+
+    def _get(self, key):
+        # A failing cache tier should only cost us the cache, never the request
+        try:
+            data = self.backend.get(key)
+            return self.deserialize(data) if data is not None else None
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to read cached response: {e}")
+            return None
+
+    def _set(self, key, entry, ttl):
+        try:
+            self.backend.set(key, self.serialize(entry), ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to cache response: {e}")
+
+    def _generation(self, group):
+        try:
+            return self.backend.get(self._generation_key(group))
+        except Exception as e:
+            self.errors += 1
+            print(f"Failed to read cache group generation: {e}")
+            return None
+
+    def _generation_key(self, group):
+        return f"{self.key_prefix}:generation:{group}"
+
+    def _make_key(self, name, groups):
+        body = request.get_json(silent=True)
+        if body is None:
+            body = request.get_data(as_text=True)
+        fingerprint = json.dumps({
+            "path": request.path,
+            "args": sorted(request.args.items(multi=True)),
+            "body": body,
+            "generations": [self._generation(group) for group in groups],
+        }, sort_keys=True, default=str)
+        digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{name}:{digest}"
@@ -0,0 +1,69 @@
+"""Single-flight coalescing of identical concurrent backend calls"""
+import threading
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+def get_singleflight():
+    """Get the process-wide single-flight group"""
+    global _singleflight
+    with _singleflight_lock:
+        if _singleflight is None:
+            _singleflight = SingleFlight()
+        return _singleflight
+
+class _Call:
+    """An in-flight computation that followers wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent callers using the same key.
+
+    Keys are tuples whose first item names the backend call, followed by its
+    arguments. The first caller for a key runs the function; callers arriving
+    while it runs wait for it and get the same result, or the same exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs) unless an identical call is already in flight"""
+        with self._lock:
+            stats = self._stats.setdefault(key[0], {"calls": 0, "executions": 0, "coalesced": 0})
+            stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                stats["executions"] += 1
+            else:
+                stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Call, execution and coalesced counters per backend call name"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
@@ -0,0 +1,65 @@
+"""Socket.IO client managers that share events between workers and replicas"""
+import os
+import json
+import queue
+import threading
+import socketio
+from firelink.cache_backends import redis_url_from_env
+
+DEFAULT_CHANNEL = "firelink-socketio"
+
+def create_socketio_manager():
+    """Create the Socket.IO client manager selected by SOCKETIO_MESSAGE_QUEUE.
+
+    "none" (the default) returns None so each process keeps its own sessions,
+    "redis" passes events between every worker and replica through a
+    Redis-protocol server, and "memory" is an in-process stand-in for the queue.
+    """
+    backend = os.getenv("SOCKETIO_MESSAGE_QUEUE", "none").lower()
+    channel = os.getenv("SOCKETIO_CHANNEL", DEFAULT_CHANNEL)
+    if backend == "redis":
+        return socketio.RedisManager(redis_url_from_env(), channel=channel)
+    if backend == "memory":
+        return InProcessManager(channel=channel)
+    return None
+
+class InProcessManager(socketio.PubSubManager):
+    """In-process stand-in for a message queue, mainly for tests.
+
+    Every manager on the same channel in this process receives the messages
+    the others publish, so several Socket.IO servers can be wired together as
+    if they were separate workers. Messages are JSON encoded on the way
+    through, like they would be on a real queue.
+    """
+    name = "memory"
+    _channels = {}
+    _channels_lock = threading.Lock()
+
+    def __init__(self, channel=DEFAULT_CHANNEL, write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._inbox = queue.Queue()
+        if not write_only:
+            with self._channels_lock:
+                self._channels.setdefault(channel, []).append(self._inbox)
+
+    def close(self):
+        """Leave the channel and stop the listening thread"""
+        with self._channels_lock:
+            inboxes = self._channels.get(self.channel, [])
+            if self._inbox in inboxes:
+                inboxes.remove(self._inbox)
+        self._inbox.put(None)
+
+    def _publish(self, data):
+        message = json.dumps(data)
+        with self._channels_lock:
+            inboxes = list(self._channels.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(message)
+
+    def _listen(self):
+        while True:
+            message = self._inbox.get()
+            if message is None:
+                return
+            yield message
@@ -0,0 +1,103 @@
+"""Content-addressed cache of processed app configs"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_template_cache():
+    """Get the process-wide processed template cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TemplateCache()
+        return _cache
+
+class TemplateCache:
+    """Keeps recently processed app configs keyed by a hash of the request that produced them.
+
+    Entries are stored as JSON so every get() returns a fresh copy that callers
+    may modify, and so their size is known. Entries expire after
+    TEMPLATE_CACHE_TTL seconds and the least recently used ones are evicted once
+    there are more than TEMPLATE_CACHE_MAX_ENTRIES of them or they take more
+    than TEMPLATE_CACHE_MAX_BYTES.
+    """
+    DEFAULT_TTL = 300
+    DEFAULT_MAX_ENTRIES = 32
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self):
+        self.ttl = float(os.getenv("TEMPLATE_CACHE_TTL", str(self.DEFAULT_TTL)))
+        self.max_entries = int(os.getenv("TEMPLATE_CACHE_MAX_ENTRIES", str(self.DEFAULT_MAX_ENTRIES)))
+        self.max_bytes = int(os.getenv("TEMPLATE_CACHE_MAX_BYTES", str(self.DEFAULT_MAX_BYTES)))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(fields):
+        """Canonical hash of the request fields that determine the processed config"""
+        canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get a copy of the config stored under a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            data = entry[0]
+        return json.loads(data)
+
+    def set(self, key, apps_config):
+        """Store a processed config, evicting old entries to stay within the limits"""
+        if self.ttl <= 0:
+            return
+        data = json.dumps(apps_config).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, time.monotonic() + self.ttl)
+            self._bytes += len(data)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_process(self, fields, process):
+        """Get the config for the request fields, calling process() to build it on a miss"""
+        key = self.key(fields)
+        apps_config = self.get(key)
+        if apps_config is None:
+            apps_config = process()
+            self.set(key, apps_config)
+        return apps_config
+
+    def stats(self):
+        """Hit, miss and eviction counters plus current size"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key):
+        data, _ = self._entries.pop(key)
+        self._bytes -= len(data)
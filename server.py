@@ -5,12 +5,28 @@ import os
 from flask import Flask
 from flask import request
 from flask import jsonify
+from flask import Response
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_caching import Cache
 from firelink.apps import Apps
+from firelink.apps_refresher import get_apps_list_refresher
+from firelink.deploy_queue import start_deploy_queue, get_deploy_queue, DeployQueueFull
+from firelink.release_tracker import start_release_tracker, get_release_tracker
 from firelink.flask_app_helpers import FlaskAppHelpers
-from firelink.openshift_resources import Namespace
+from firelink.health import get_health_monitor
+from firelink.openshift_resources import Namespace, EphemeralResources
+from firelink.namespace_informer import start_namespace_informer
+from firelink.namespace_feed import start_namespace_feed, get_namespace_feed, NamespaceFeed
+from firelink.prometheus_client import get_prometheus_client_factory
+from firelink.kube_client import get_kube_client_registry
+from firelink.response_cache import ResponseCache
+from firelink.cache_backends import create_cache_backend
+from firelink.socketio_manager import create_socketio_manager
+from firelink.singleflight import get_singleflight
+from firelink.template_cache import get_template_cache
+from firelink.instrumentation import (REGISTRY, SOCKETIO_CONNECTIONS, SOCKETIO_CONNECTS,
+instrument_flask, cache_metrics)
 from firelink.metrics import (PrometheusNamespaceMetrics,
 PrometheusPodMetrics,
 PrometheusClusterMetrics)
@@ -19,7 +35,10 @@ DEFAULT_PORT = 5000
 
 app = Flask(__name__)
 cache = Cache(app, config={'CACHE_TYPE': 'simple'})
-socketio = SocketIO(app, cors_allowed_origins="*", ping_timeout=600, path="/api/firelink/socket.io")
+response_cache = ResponseCache(create_cache_backend(cache))
+# With a message queue, events emitted by any worker or replica reach sockets connected to the others
+socketio = SocketIO(app, cors_allowed_origins="*", ping_timeout=600, path="/api/firelink/socket.io",
+    client_manager=create_socketio_manager())
 port = int(os.getenv('PORT', str(DEFAULT_PORT)))
 helpers = FlaskAppHelpers()
 
@@ -41,63 +60,188 @@ def log_request_info():
 # I don't know why
 app.before_request_funcs = [(None, helpers.login_to_openshift(), helpers.create_gql_client())]
 
+# Record per-route latency and cache hit ratios for /metrics
+instrument_flask(app)
+cache_metrics({"response": response_cache.stats, "template": lambda: get_template_cache().stats()})
+
+# Keep an in-memory index of ephemeral namespaces and reservations
+# so namespace listing doesn't hit the API server on every request
+start_namespace_informer(EphemeralResources)
+
+# Keep apps list snapshots warm between requests
+get_apps_list_refresher().start()
+
+# Probe our backends in the background so health checks answer from memory
+get_health_monitor().start()
+
 @app.route("/health")
 def health():
     """Health check endpoint"""
-    return ("", 200) if FlaskAppHelpers().health() else ("", 500)
+    ok, _ = get_health_monitor().readiness()
+    return ("", 200) if ok else ("", 500)
+
+@app.route("/health/live")
+def health_live():
+    """Liveness endpoint"""
+    ok, report = get_health_monitor().liveness()
+    return report, 200 if ok else 500
+
+@app.route("/health/ready")
+def health_ready():
+    """Readiness endpoint with per-dependency status and probe latency"""
+    ok, report = get_health_monitor().readiness()
+    return report, 200 if ok else 500
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus metrics about firelink itself"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@socketio.on('connect')
+def socket_connect():
+    """Count Socket.IO connections"""
+    SOCKETIO_CONNECTS.labels().inc()
+    SOCKETIO_CONNECTIONS.labels().inc()
+
+@socketio.on('disconnect')
+def socket_disconnect(*args):
+    """Count Socket.IO disconnections and stop streaming deploy events to the socket"""
+    SOCKETIO_CONNECTIONS.labels().dec()
+    deploy_queue = get_deploy_queue()
+    if deploy_queue is not None:
+        deploy_queue.unsubscribe(request.sid)
+
+@app.route("/api/firelink/stats")
+def stats():
+    """Internal counters for the shared backend clients"""
+    return {
+        "kubernetes": get_kube_client_registry().stats(),
+        "prometheus": get_prometheus_client_factory().stats(),
+        "response_cache": response_cache.stats(),
+        "singleflight": get_singleflight().stats(),
+        "deploy_queue": get_deploy_queue().stats(),
+        "template_cache": get_template_cache().stats(),
+        "namespace_feed": get_namespace_feed().stats() if get_namespace_feed() else None,
+    }
 
 @app.route("/api/firelink/cluster/top_nodes")
+@response_cache.cached("cluster_top_nodes", etag=True)
 def cluster_top_nodes():
     """Get top nodes in the cluster"""
     return PrometheusClusterMetrics().cluster_info()
 
 @app.route("/api/firelink/cluster/cpu_usage")
+@response_cache.cached("cluster_cpu_usage")
 def cluster_cpu_usage():
     """Get CPU usage for the cluster"""
     return PrometheusClusterMetrics().cluster_cpu_usage()
 
 @app.route("/api/firelink/cluster/memory_usage")
+@response_cache.cached("cluster_memory_usage")
 def cluster_memory_usage():
     """Get memory usage for the cluster"""
     return PrometheusClusterMetrics().cluster_memory_usage()
 
 @app.route("/api/firelink/namespace/list")
 def namespaces_list():
-    """Get list of namespaces"""
+    """Get list of namespaces, or only the rows that changed since a version when since is given"""
+    if "since" not in request.args:
+        return _namespaces_list()
+    feed = get_namespace_feed()
+    if feed is None:
+        return {"completed": False, "message": "Namespace list versions are disabled"}, 400
+    # An empty since gets a snapshot along with the version to poll from next time
+    return response_cache.conditional(jsonify(feed.resume(request.args["since"])))
+
+@response_cache.cached("namespace_list", groups=[ResponseCache.NAMESPACES_GROUP], etag=True)
+def _namespaces_list():
     return Namespace(jsonify).list()
 
+# Push namespace list changes to subscribed sockets so the frontend doesn't have to poll
+start_namespace_feed(lambda: Namespace().list(), socketio.emit)
+
+@socketio.on('subscribe-namespace-list')
+def namespace_list_subscribe(incoming_request=None):
+    """Stream namespace list changes to this socket, starting from a snapshot or a resume token"""
+    feed = get_namespace_feed()
+    if feed is None:
+        return {'message': "Namespace list updates are disabled", 'error': True}
+    join_room(NamespaceFeed.ROOM)
+    return feed.resume((incoming_request or {}).get("resume_token"))
+
+@socketio.on('unsubscribe-namespace-list')
+def namespace_list_unsubscribe(*args):
+    """Stop streaming namespace list changes to this socket"""
+    leave_room(NamespaceFeed.ROOM)
+
 @app.route("/api/firelink/get_template", methods=["POST"])
 def get_template():
     """Get template for an app"""
     return Apps(emit, jsonify).get_processed_template(request.json)
 
 @app.route("/api/firelink/namespace/resource_metrics")
+@response_cache.cached("namespace_resource_metrics", groups=[ResponseCache.NAMESPACES_GROUP])
 def namespace_resource_metrics():
     """Get resources for all namespaces"""
     namespaces = Namespace().list()
     namespaces = [namespace["namespace"] for namespace in namespaces if namespace["reserved"]]
-    metrics = PrometheusNamespaceMetrics().get_resources_for_namespaces(namespaces)
+    metrics = PrometheusNamespaceMetrics().get_resources_for_namespaces(
+        namespaces, combined=_combined_metrics_requested())
     return metrics
 
 @app.route("/api/firelink/namespace/resource_metrics/<namespace>")
+@response_cache.cached("namespace_resource_metrics", groups=[ResponseCache.NAMESPACES_GROUP])
 def namespace_resource_metrics_single(namespace):
     """Get resources for a single namespace"""
-    return PrometheusNamespaceMetrics().get_resources_for_namespace(namespace)
+    return PrometheusNamespaceMetrics().get_resources_for_namespace(
+        namespace, combined=_combined_metrics_requested())
+
+def _combined_metrics_requested():
+    """Check if the caller asked for the single combined Prometheus query"""
+    return request.args.get("combined", "false").lower() == "true"
 
 @app.route("/api/firelink/namespace/top_pods", methods=["POST"])
+@response_cache.cached("namespace_top_pods", groups=[ResponseCache.NAMESPACES_GROUP])
 def namespace_top_pods():
     """Get top pods for a namespace"""
     return PrometheusPodMetrics().top_pods(request.json["namespace"])
 
+def _namespaces_changed():
+    """Drop cached namespace responses and have the feed look for changes"""
+    response_cache.invalidate(ResponseCache.NAMESPACES_GROUP)
+    feed = get_namespace_feed()
+    if feed is not None:
+        feed.notify()
+
 @app.route("/api/firelink/namespace/reserve", methods=["POST"])
 def namespace_reserve():
     """Reserve a namespace"""
-    return Namespace(jsonify).reserve(request.json)
+    response = Namespace(jsonify).reserve(request.json)
+    _namespaces_changed()
+    return response
 
 @app.route("/api/firelink/namespace/release", methods=["POST"])
 def namespace_release():
     """Release a namespace"""
-    return Namespace(jsonify).release(request.json)
+    response = Namespace(jsonify).release(request.json)
+    _namespaces_changed()
+    return response
+
+@app.route("/api/firelink/namespace/release/<release_id>")
+def namespace_release_status(release_id):
+    """Get the status of a namespace release"""
+    handle = get_release_tracker().get(release_id)
+    if handle is None:
+        return {"completed": False, "message": f"Release {release_id} not found"}, 404
+    return handle.to_dict()
+
+def _release_finished(handle):
+    """Publish a settled namespace release"""
+    _namespaces_changed()
+    socketio.emit('release-namespace', handle.to_dict())
+
+# Confirm releases in the background so the release endpoint returns straight away
+start_release_tracker(_release_finished)
 
 @app.route("/api/firelink/namespace/describe/<namespace>")
 def namespace_describe(namespace):
@@ -107,16 +251,53 @@ def namespace_describe(namespace):
 @app.route("/api/firelink/apps/list")
 def apps_list():
     """List apps"""
-    return Apps(emit, jsonify).list()
+    # Served from the apps list snapshot, which already refreshes in the background
+    return response_cache.conditional(Apps(emit, jsonify).list())
+
+@app.route("/api/firelink/deploy/jobs")
+def deploy_jobs():
+    """List queued, running and recently finished deployments"""
+    return jsonify([job.to_dict() for job in get_deploy_queue().jobs()])
+
+@app.route("/api/firelink/deploy/jobs/<job_id>")
+def deploy_job(job_id):
+    """Get the status of a deployment"""
+    job = get_deploy_queue().get(job_id)
+    if job is None:
+        return {"completed": False, "message": f"Deploy job {job_id} not found"}, 404
+    return job.to_dict()
+
+def _run_deploy_job(job):
+    """Run a queued deployment, streaming its events to the job's subscribers"""
+    try:
+        job.emit('monitor-deploy-app', {'message':"Starting deployment for apps: " + ", ".join(job.request["app_names"])})
+        Apps(job.emit, jsonify).deploy(job.request)
+    finally:
+        _namespaces_changed()
+
+# Run deployments on a bounded worker pool instead of inside the socket handler
+start_deploy_queue(_run_deploy_job, socketio.emit)
 
 @socketio.on('deploy-app')
 def apps_deploy(incoming_request):
-    """Deploy apps"""
+    """Queue an app deployment and stream its events back to this socket"""
     try:
-        emit('monitor-deploy-app', {'message':"Starting deployment for apps: ".join(incoming_request["app_names"])})
-        Apps(emit, jsonify).deploy(incoming_request)
-    except Exception as e:
-        emit('error-deploy-app', {'message':f"Server error deploying apps: {str(e)}"})
+        job = get_deploy_queue().submit(incoming_request, sid=request.sid)
+    except DeployQueueFull as e:
+        emit('error-deploy-app', {'message': str(e), 'completed': False, 'error': True})
+        return None
+    return {'job_id': job.id}
+
+@socketio.on('subscribe-deploy-app')
+def apps_deploy_subscribe(incoming_request):
+    """Stream an existing deployment's events to this socket, replaying what was missed"""
+    job = get_deploy_queue().get(incoming_request.get("job_id"))
+    if job is None:
+        emit('error-deploy-app', {'message': f"Deploy job {incoming_request.get('job_id')} not found",
+            'completed': False, 'error': True})
+        return None
+    job.subscribe(request.sid)
+    return job.to_dict()
 
 if __name__ == '__main__':
     socketio.run(app, port=port)
@@ -0,0 +1,126 @@
+"""Incremental apply tests"""
+import sys
+import json
+import ocviapy
+sys.path.append('.')
+from firelink import apps as apps_module
+from firelink.apps import Apps
+from firelink.apply_index import (ApplyIndex, FINGERPRINT_ANNOTATION, annotate, item_fingerprint,
+    item_key, resource_type)
+
+def _item(kind, name, image="quay.io/app:1", api_version="cloud.redhat.com/v1alpha1"):
+    return {"apiVersion": api_version, "kind": kind, "metadata": {"name": name}, "spec": {"image": image}}
+
+class FakeCluster:
+    """Live objects in a namespace, updated by every apply whichever process sends it"""
+    def __init__(self):
+        self.objects = {}
+        self.applied = []
+
+    def apply_config(self, ns, config):
+        self.applied.append(config["items"])
+        for item in config["items"]:
+            self.objects[item_key(item)] = item
+
+    def live_fingerprints(self, ns, items):
+        return {key: (live["metadata"].get("annotations") or {}).get(FINGERPRINT_ANNOTATION)
+            for key, live in self.objects.items()}
+
+def _deployer(monkeypatch, cluster):
+    """An Apps instance standing in for one worker or replica, sharing the cluster with the others"""
+    index = ApplyIndex()
+    monkeypatch.setattr(index, "live_fingerprints", cluster.live_fingerprints)
+    events = []
+    apps = Apps(emit=lambda event, data: events.append(data))
+    apps.index = index
+    apps.events = events
+    return apps
+
+def _deploy(monkeypatch, apps, items, **request):
+    monkeypatch.setattr(apps_module, "get_apply_index", lambda: apps.index)
+    monkeypatch.setattr(apps, "_render_templates", lambda request: {"kind": "List", "items": items})
+    apps._process_apps(dict(request, clowd_env="env-ephemeral-aaaaaa"), "ephemeral-aaaaaa", False)
+
+def test_unchanged_items_are_skipped():
+    """Only items whose live object carries a different or no fingerprint should be reported as changed"""
+    cluster = FakeCluster()
+    cluster.apply_config("ephemeral-aaaaaa", {"items": [
+        annotate(_item("ClowdApp", "rbac")), annotate(_item("ConfigMap", "settings", api_version="v1"))]})
+    changed, unchanged = ApplyIndex().diff("ephemeral-aaaaaa", [])
+    assert (changed, unchanged) == ([], [])
+    index = ApplyIndex()
+    index.live_fingerprints = cluster.live_fingerprints
+    changed, unchanged = index.diff("ephemeral-aaaaaa", [
+        _item("ClowdApp", "rbac", image="quay.io/app:2"),
+        _item("ConfigMap", "settings", api_version="v1"),
+        _item("Secret", "creds", api_version="v1"),
+    ])
+    assert [item["metadata"]["name"] for item in changed] == ["rbac", "creds"]
+    assert [item["metadata"]["name"] for item in unchanged] == ["settings"]
+
+def test_fingerprint_ignores_its_own_annotation():
+    """An annotated item should fingerprint the same as the item it was built from"""
+    item = _item("ClowdApp", "rbac")
+    annotated = annotate(item)
+    assert annotated["metadata"]["annotations"][FINGERPRINT_ANNOTATION] == item_fingerprint(item)
+    assert item_fingerprint(annotated) == item_fingerprint(item)
+    assert "annotations" not in item["metadata"]
+
+def test_resource_type_is_qualified():
+    """Kinds should be qualified with version and group so oc picks the right resource, core kinds left bare"""
+    assert resource_type(_item("ClowdApp", "rbac")) == "ClowdApp.v1alpha1.cloud.redhat.com"
+    assert resource_type(_item("ConfigMap", "settings", api_version="v1")) == "ConfigMap"
+
+def test_live_fingerprints_reads_every_kind_in_one_call(monkeypatch):
+    """The live objects of every kind should be read with one oc get in the namespace"""
+    live = annotate(_item("ConfigMap", "settings", api_version="v1"))
+    calls = []
+    def fake_oc(*args, **kwargs):
+        calls.append((args, kwargs))
+        return json.dumps({"items": [live]})
+    monkeypatch.setattr(ocviapy, "oc", fake_oc)
+    items = [_item("ClowdApp", "rbac"), _item("ConfigMap", "settings", api_version="v1"),
+        _item("Secret", "creds", api_version="v1"), _item("ClowdApp", "host-inventory")]
+    fingerprints = ApplyIndex().live_fingerprints("ephemeral-aaaaaa", items)
+    assert calls == [(("get", "ClowdApp.v1alpha1.cloud.redhat.com,ConfigMap,Secret", "-n", "ephemeral-aaaaaa"),
+        {"o": "json", "_silent": True})]
+    assert fingerprints == {item_key(live): item_fingerprint(live)}
+
+def test_unreadable_live_objects_apply_everything():
+    """If the live objects can't be read, nothing should be skipped"""
+    index = ApplyIndex()
+    def failing(ns, items):
+        raise RuntimeError("oc get failed")
+    index.live_fingerprints = failing
+    changed, unchanged = index.diff("ephemeral-aaaaaa", [_item("ClowdApp", "rbac")])
+    assert (len(changed), unchanged) == (1, [])
+
+def test_redeploy_applies_only_changes(monkeypatch):
+    """A redeploy with one changed image should only apply that item and report the counts"""
+    cluster = FakeCluster()
+    monkeypatch.setattr(apps_module.bonfire, "apply_config", cluster.apply_config)
+    apps = _deployer(monkeypatch, cluster)
+    _deploy(monkeypatch, apps, [_item("ClowdApp", "rbac"), _item("ClowdApp", "host-inventory")])
+    _deploy(monkeypatch, apps, [_item("ClowdApp", "rbac", image="quay.io/app:2"), _item("ClowdApp", "host-inventory")])
+    assert [len(batch) for batch in cluster.applied] == [2, 1]
+    assert (apps.events[-1]["applied"], apps.events[-1]["skipped"]) == (1, 1)
+    _deploy(monkeypatch, apps, [_item("ClowdApp", "rbac", image="quay.io/app:2")], force_apply=True)
+    assert len(cluster.applied[-1]) == 1
+
+def test_changes_made_elsewhere_are_noticed(monkeypatch):
+    """Deploys through another replica and deleted objects should not be mistaken for unchanged items"""
+    cluster = FakeCluster()
+    monkeypatch.setattr(apps_module.bonfire, "apply_config", cluster.apply_config)
+    replica_a = _deployer(monkeypatch, cluster)
+    replica_b = _deployer(monkeypatch, cluster)
+    version_1 = [_item("ClowdApp", "rbac", image="quay.io/app:1")]
+    version_2 = [_item("ClowdApp", "rbac", image="quay.io/app:2")]
+    _deploy(monkeypatch, replica_a, version_1)
+    _deploy(monkeypatch, replica_b, version_2)
+    _deploy(monkeypatch, replica_a, version_1)
+    assert len(cluster.applied) == 3
+    assert cluster.objects[item_key(version_1[0])]["spec"]["image"] == "quay.io/app:1"
+
+    cluster.objects.clear()
+    _deploy(monkeypatch, replica_a, version_1)
+    assert len(cluster.applied) == 4
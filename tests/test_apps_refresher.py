@@ -0,0 +1,52 @@
+"""Apps list refresher tests"""
+import sys
+import time
+import threading
+sys.path.append('.')
+from firelink.apps_refresher import AppsListRefresher
+
+KEY = ("appsre", "insights-ephemeral", "insights-stage", "insights-stage", "{}")
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_first_request_loads_and_later_requests_use_snapshot(monkeypatch):
+    """Only the first request for a key should call the loader while fresh"""
+    monkeypatch.setenv("APPS_LIST_MAX_AGE", "60")
+    refresher = AppsListRefresher()
+    calls = []
+    def loader():
+        calls.append(1)
+        return [{"name": "rbac"}]
+    assert refresher.get(KEY, loader) == [{"name": "rbac"}]
+    assert refresher.get(KEY, loader) == [{"name": "rbac"}]
+    assert len(calls) == 1
+
+def test_stale_snapshot_is_served_while_refreshing(monkeypatch):
+    """A stale snapshot should be returned immediately and replaced in the background"""
+    monkeypatch.setenv("APPS_LIST_MAX_AGE", "0")
+    refresher = AppsListRefresher()
+    refresher.get(KEY, lambda: ["old"])
+    release = threading.Event()
+    def slow_loader():
+        release.wait(2)
+        return ["new"]
+    start = time.monotonic()
+    assert refresher.get(KEY, slow_loader) == ["old"]
+    assert time.monotonic() - start < 0.5
+    release.set()
+    assert _wait_for(lambda: refresher.get(KEY, lambda: ["newer"]) in (["new"], ["newer"]))
+
+def test_failed_refresh_keeps_last_good_snapshot(monkeypatch):
+    """A refresh error shouldn't replace the last good snapshot"""
+    monkeypatch.setenv("APPS_LIST_MAX_AGE", "0")
+    refresher = AppsListRefresher()
+    refresher.get(KEY, lambda: ["good"])
+    def failing_loader():
+        raise RuntimeError("qontract unavailable")
+    assert refresher.get(KEY, failing_loader) == ["good"]
+    assert _wait_for(lambda: not refresher._refreshing)
+    assert refresher._snapshots[KEY][1] == ["good"]
@@ -0,0 +1,62 @@
+"""Pipelined deploy tests"""
+import sys
+import gevent
+import gevent.event
+sys.path.append('.')
+from firelink import apps as apps_module
+from firelink.apps import Apps
+from firelink.template_cache import TemplateCache
+
+def _deploy_request():
+    return {
+        "app_names": ["rbac"], "requester": "tester", "duration": "1h", "no_release_on_fail": True,
+        "frontends": False, "pool": "default", "namespace": "", "timeout": 600, "source": "appsre",
+        "get_dependencies": True, "optional_deps_method": "hybrid", "set_image_tag": {}, "ref_env": None,
+        "target_env": "insights-ephemeral", "local_config_method": "merge", "set_template_ref": {},
+        "set_parameter": {}, "clowd_env": "", "local_config_path": None, "preferred_params": {},
+        "fallback_ref_env": "", "single_replicas": True, "name": None, "component_filter": [],
+        "import_secrets": False, "secrets_dir": "", "local": True,
+    }
+
+def test_templates_render_while_the_namespace_is_reserved(monkeypatch):
+    """Rendering should start before the reservation finishes and get the real clowd_env bound"""
+    cache = TemplateCache()
+    monkeypatch.setattr(apps_module, "get_template_cache", lambda: cache)
+    rendering = gevent.event.Event()
+    def get_namespace(*args):
+        # The reservation only completes once rendering has started alongside it
+        assert rendering.wait(5)
+        return "ephemeral-aaaaaa", True
+    def render(request):
+        rendering.set()
+        env = request["clowd_env"]
+        return {"kind": "List", "items": [
+            {"kind": "ClowdApp", "metadata": {"name": "rbac"}, "spec": {"envName": env}},
+            {"kind": "Frontend", "metadata": {"name": "rbac"}, "spec": {"title": f"{env}-frontend"}},
+        ]}
+    applied = []
+    monkeypatch.setattr(apps_module.bonfire, "_get_namespace", get_namespace)
+    monkeypatch.setattr(apps_module.bonfire, "find_clowd_env_for_ns",
+        lambda ns: {"metadata": {"name": "env-ephemeral-aaaaaa"}})
+    monkeypatch.setattr(apps_module.bonfire, "apply_config", lambda ns, config: applied.append(config))
+    events = []
+    apps = Apps(emit=lambda event, data: events.append((event, data)))
+    monkeypatch.setattr(apps.helpers, "route_guard", lambda: None)
+    monkeypatch.setattr(apps, "_bonfire_process", render)
+    monkeypatch.setattr(apps_module.get_apply_index(), "live_fingerprints", lambda ns, items: {})
+    apps.deploy(_deploy_request())
+    assert events[-1][0] == Apps.DEPLOY_END_EVENT
+    assert events[-1][1]["completed"] is True
+    items = applied[0]["items"]
+    assert items[0]["spec"]["envName"] == "env-ephemeral-aaaaaa"
+    assert items[1]["spec"]["title"] == "env-ephemeral-aaaaaa-frontend"
+
+def test_rendered_templates_are_reused_across_namespaces():
+    """The cached render should be bound to each namespace's clowd_env"""
+    apps = Apps()
+    rendered = {"items": [{"spec": {"envName": Apps.CLOWD_ENV_PLACEHOLDER, "replicas": 1}}]}
+    first = apps._process_templates({"clowd_env": "env-ephemeral-aaaaaa"}, rendered)
+    second = apps._process_templates({"clowd_env": "env-ephemeral-bbbbbb"}, rendered)
+    assert first["items"][0]["spec"] == {"envName": "env-ephemeral-aaaaaa", "replicas": 1}
+    assert second["items"][0]["spec"]["envName"] == "env-ephemeral-bbbbbb"
+    assert rendered["items"][0]["spec"]["envName"] == Apps.CLOWD_ENV_PLACEHOLDER
@@ -0,0 +1,136 @@
+"""Deploy queue tests"""
+import sys
+import threading
+import pytest
+sys.path.append('.')
+from firelink.deploy_queue import DeployQueue, DeployJob, DeployQueueFull
+
+class RecordingEmit:
+    """Collects events sent to sockets"""
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event, data, to=None):
+        with self._lock:
+            self.sent.append((to, event, data))
+
+    def events_for(self, sid):
+        """Events sent to one socket"""
+        with self._lock:
+            return [(event, data) for to, event, data in self.sent if to == sid]
+
+class BlockingRunner:
+    """Runner whose jobs finish only when released"""
+    def __init__(self):
+        self.started = []
+        self.release = {}
+        self._lock = threading.Lock()
+        self._started_event = threading.Condition(self._lock)
+
+    def __call__(self, job):
+        event = threading.Event()
+        with self._lock:
+            self.release[job.id] = event
+            self.started.append(job.id)
+            self._started_event.notify_all()
+        event.wait(5)
+        job.emit("end-deploy-app", {"message": "done", "completed": True, "error": False})
+
+    def wait_started(self, count):
+        """Wait until count jobs have started"""
+        with self._lock:
+            return self._started_event.wait_for(lambda: len(self.started) >= count, 5)
+
+def _request(requester, namespace=""):
+    return {"requester": requester, "app_names": ["rbac"], "namespace": namespace}
+
+def _wait_finished(job):
+    for _ in range(500):
+        if job.finished_at is not None:
+            return True
+        threading.Event().wait(0.01)
+    return False
+
+def test_jobs_stream_events_to_the_subscribing_socket():
+    """Events emitted by the runner should reach the submitting socket tagged with the job ID"""
+    emit = RecordingEmit()
+    def runner(job):
+        job.emit("monitor-deploy-app", {"message": "Applying app configs...", "completed": False, "error": False})
+        job.emit("end-deploy-app", {"message": "Deployed", "completed": True, "error": False})
+    queue = DeployQueue(runner, emit)
+    queue.start()
+    job = queue.submit(_request("alice"), sid="sid-1")
+    assert _wait_finished(job)
+    events = emit.events_for("sid-1")
+    assert [event for event, _ in events] == ["monitor-deploy-app", "monitor-deploy-app", "end-deploy-app"]
+    assert all(data["job_id"] == job.id for _, data in events)
+    assert queue.get(job.id).to_dict()["status"] == DeployJob.SUCCEEDED
+
+def test_disconnected_sockets_stop_receiving_events():
+    """After a socket is unsubscribed, neither running nor finished jobs send it anything"""
+    emit = RecordingEmit()
+    runner = BlockingRunner()
+    queue = DeployQueue(runner, emit)
+    queue.start()
+    job = queue.submit(_request("alice"), sid="sid-1")
+    job.subscribe("sid-2")
+    assert runner.wait_started(1)
+    sent_before = len(emit.events_for("sid-1"))
+    queue.unsubscribe("sid-1")
+    runner.release[job.id].set()
+    assert _wait_finished(job)
+    assert len(emit.events_for("sid-1")) == sent_before
+    assert emit.events_for("sid-2")[-1][0] == "end-deploy-app"
+    assert job.subscribers == {"sid-2"}
+
+def test_late_subscribers_get_the_event_history():
+    """Subscribing to a job should replay the events already emitted"""
+    emit = RecordingEmit()
+    queue = DeployQueue(lambda job: None, emit)
+    job = queue.submit(_request("alice"))
+    job.subscribe("sid-2")
+    assert [event for event, _ in emit.events_for("sid-2")] == ["monitor-deploy-app"]
+
+def test_runner_errors_fail_the_job():
+    """An exception from the runner should be reported as an error event"""
+    emit = RecordingEmit()
+    def runner(job):
+        raise RuntimeError("bonfire exploded")
+    queue = DeployQueue(runner, emit)
+    queue.start()
+    job = queue.submit(_request("alice"), sid="sid-1")
+    assert _wait_finished(job)
+    assert job.status == DeployJob.FAILED
+    assert emit.events_for("sid-1")[-1][0] == "error-deploy-app"
+
+def test_requester_limit_lets_other_requesters_go_first(monkeypatch):
+    """A requester at their limit should not block jobs from other requesters"""
+    monkeypatch.setenv("DEPLOY_WORKERS", "2")
+    monkeypatch.setenv("DEPLOY_MAX_PER_REQUESTER", "1")
+    runner = BlockingRunner()
+    queue = DeployQueue(runner, RecordingEmit())
+    queue.start()
+    first = queue.submit(_request("alice"))
+    second = queue.submit(_request("alice"))
+    third = queue.submit(_request("bob"))
+    assert runner.wait_started(2)
+    assert runner.started == [first.id, third.id]
+    assert second.status == DeployJob.QUEUED
+    stats = queue.stats()
+    assert stats["depth"] == 1
+    assert stats["running"] == 2
+    runner.release[first.id].set()
+    assert runner.wait_started(3)
+    assert runner.started[2] == second.id
+    for job_id in list(runner.release):
+        runner.release[job_id].set()
+    assert _wait_finished(second)
+
+def test_full_queue_rejects_submissions(monkeypatch):
+    """Submissions beyond DEPLOY_MAX_QUEUED should be refused"""
+    monkeypatch.setenv("DEPLOY_MAX_QUEUED", "1")
+    queue = DeployQueue(lambda job: None, RecordingEmit())
+    queue.submit(_request("alice"))
+    with pytest.raises(DeployQueueFull):
+        queue.submit(_request("bob"))
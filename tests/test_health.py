@@ -0,0 +1,118 @@
+"""Health monitor tests"""
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append('.')
+from firelink.health import HealthMonitor
+
+def _monitor(monkeypatch, checks, required="kubernetes"):
+    monkeypatch.setenv("HEALTH_REQUIRED_CHECKS", required)
+    monitor = HealthMonitor()
+    monitor.checks = checks
+    return monitor
+
+def _ok():
+    pass
+
+def _failing():
+    raise RuntimeError("connection refused")
+
+def test_not_ready_before_first_probe(monkeypatch):
+    """Readiness should wait for the first probe while liveness doesn't"""
+    monitor = _monitor(monkeypatch, {"kubernetes": _ok})
+    assert monitor.readiness()[0] is False
+    assert monitor.liveness()[0] is True
+
+def test_readiness_reports_every_dependency(monkeypatch):
+    """Optional dependencies are reported but don't gate readiness"""
+    monitor = _monitor(monkeypatch, {"kubernetes": _ok, "prometheus": _failing})
+    monitor.run_checks()
+    ok, report = monitor.readiness()
+    assert ok is True
+    assert report["checks"]["kubernetes"]["ok"] is True
+    assert report["checks"]["kubernetes"]["required"] is True
+    assert report["checks"]["prometheus"]["ok"] is False
+    assert report["checks"]["prometheus"]["error"] == "connection refused"
+    assert report["checks"]["prometheus"]["required"] is False
+    assert "latency_ms" in report["checks"]["prometheus"]
+
+def test_failing_required_dependency_is_not_ready(monkeypatch):
+    """A failing required dependency should fail readiness"""
+    monitor = _monitor(monkeypatch, {"kubernetes": _failing, "qontract": _ok}, required="kubernetes,qontract")
+    monitor.run_checks()
+    assert monitor.readiness()[0] is False
+
+def test_first_run_that_never_finishes_stalls_liveness(monkeypatch):
+    """Liveness should only wait for the first run for as long as it waits between later runs"""
+    monkeypatch.setenv("HEALTH_CHECK_INTERVAL", "0.05")
+    monkeypatch.setenv("HEALTH_CHECK_TIMEOUT", "0.05")
+    hung = threading.Event()
+    monitor = _monitor(monkeypatch, {"kubernetes": lambda: hung.wait(5)})
+    monitor.start()
+    try:
+        assert monitor.liveness()[0] is True
+        time.sleep(0.4)
+        assert monitor.liveness() == (False, {"status": "stalled"})
+    finally:
+        hung.set()
+
+class _RoutedPrometheusHandler(BaseHTTPRequestHandler):
+    """Like a routed thanos-querier: only the query API's paths are served"""
+    paths = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        self.send_response(200 if self.path.startswith("/api/v1/") else 404)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_prometheus_probe_uses_the_query_api(monkeypatch):
+    """A Prometheus that refuses "/" but serves its API should pass the probe"""
+    server = _serve(_RoutedPrometheusHandler)
+    try:
+        monkeypatch.setenv("PROMETHEUS_URL", f"http://127.0.0.1:{server.server_port}/")
+        monitor = HealthMonitor()
+        monitor.checks = {"prometheus": monitor.checks["prometheus"]}
+        monitor.run_checks()
+        assert monitor.readiness()[1]["checks"]["prometheus"]["ok"] is True
+        assert _RoutedPrometheusHandler.paths == ["/api/v1/status/buildinfo"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+class _HangingHandler(BaseHTTPRequestHandler):
+    """Accepts the request but answers long after any health check timeout"""
+    def do_GET(self):
+        time.sleep(2)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def test_hanging_prometheus_fails_within_the_timeout(monkeypatch):
+    """A Prometheus that never answers fails its probe after HEALTH_CHECK_TIMEOUT, without retries"""
+    server = _serve(_HangingHandler)
+    try:
+        monkeypatch.setenv("PROMETHEUS_URL", f"http://127.0.0.1:{server.server_port}")
+        monkeypatch.setenv("HEALTH_CHECK_TIMEOUT", "0.2")
+        monitor = HealthMonitor()
+        monitor.checks = {"prometheus": monitor.checks["prometheus"]}
+        start = time.monotonic()
+        monitor.run_checks()
+        assert time.monotonic() - start < 1
+        _, report = monitor.readiness()
+        assert report["checks"]["prometheus"]["ok"] is False
+        assert monitor.liveness()[0] is True
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,64 @@
+"""Self-instrumentation tests"""
+import sys
+import pytest
+from flask import Flask
+sys.path.append('.')
+from firelink.instrumentation import (Registry, Counter, Histogram, CallbackMetric, REGISTRY,
+track_backend, instrument_flask)
+
+def test_histogram_renders_cumulative_buckets():
+    """Buckets should be cumulative and end with +Inf, _sum and _count"""
+    registry = Registry()
+    histogram = Histogram("test_duration_seconds", "Test latency", ("route",), buckets=(0.1, 1), registry=registry)
+    for value in (0.05, 0.5, 5):
+        histogram.labels("/list").observe(value)
+    text = registry.render()
+    assert 'test_duration_seconds_bucket{route="/list",le="0.1"} 1' in text
+    assert 'test_duration_seconds_bucket{route="/list",le="1.0"} 2' in text
+    assert 'test_duration_seconds_bucket{route="/list",le="+Inf"} 3' in text
+    assert 'test_duration_seconds_count{route="/list"} 3' in text
+    assert "# TYPE test_duration_seconds histogram" in text
+
+def test_label_values_are_escaped():
+    """Quotes and backslashes in label values must not break the exposition format"""
+    registry = Registry()
+    Counter("test_total", "Test counter", ("operation",), registry=registry).labels('say "hi"\\').inc(2)
+    assert 'test_total{operation="say \\"hi\\"\\\\"} 2' in registry.render()
+
+def test_callback_metrics_are_read_at_scrape_time():
+    """Callback metrics should report the current value and survive a failing callback"""
+    registry = Registry()
+    hits = {"value": 1}
+    CallbackMetric("test_hits", "Test hits", "gauge", ("cache",), lambda: {("response",): hits["value"]},
+        registry=registry)
+    CallbackMetric("test_broken", "Broken", "gauge", (), lambda: 1 / 0, registry=registry)
+    hits["value"] = 3
+    assert 'test_hits{cache="response"} 3' in registry.render()
+
+def test_backend_errors_are_counted():
+    """A raising backend call should be timed and counted as an error"""
+    with pytest.raises(ValueError):
+        with track_backend("test-backend", "explode"):
+            raise ValueError("boom")
+    with track_backend("test-backend", "ok"):
+        pass
+    text = REGISTRY.render()
+    assert 'firelink_backend_call_errors_total{backend="test-backend",operation="explode"} 1' in text
+    assert 'firelink_backend_call_duration_seconds_count{backend="test-backend",operation="ok"} 1' in text
+
+def test_flask_routes_are_timed_by_rule():
+    """Requests should be recorded under their route template with the response status"""
+    app = Flask(__name__)
+    instrument_flask(app)
+
+    @app.route("/instrumented/<name>")
+    def instrumented(name):
+        return {"name": name}
+
+    client = app.test_client()
+    client.get("/instrumented/a")
+    client.get("/instrumented/b")
+    text = REGISTRY.render()
+    assert ('firelink_http_request_duration_seconds_count'
+        '{route="/instrumented/<name>",method="GET",status="200"} 2') in text
+    assert 'firelink_http_requests_in_flight{route="/instrumented/<name>"} 0' in text
@@ -0,0 +1,58 @@
+"""Kubernetes client registry tests"""
+import os
+import sys
+sys.path.append('.')
+from firelink.kube_client import KubeClientRegistry
+
+KUBECONFIG_TEMPLATE = """
+apiVersion: v1
+kind: Config
+clusters:
+- name: test
+  cluster:
+    server: {server}
+contexts:
+- name: test
+  context:
+    cluster: test
+    user: test
+current-context: test
+users:
+- name: test
+  user:
+    token: sha256~test
+"""
+
+def _write_kubeconfig(path, server):
+    path.write_text(KUBECONFIG_TEMPLATE.format(server=server))
+
+def test_client_is_loaded_once_and_pooled(tmp_path, monkeypatch):
+    """Repeated lookups should share one ApiClient with the configured pool size"""
+    kubeconfig = tmp_path / "config"
+    _write_kubeconfig(kubeconfig, "https://api.one.invalid:6443")
+    monkeypatch.setenv("KUBECONFIG", str(kubeconfig))
+    monkeypatch.setenv("KUBE_POOL_SIZE", "7")
+    registry = KubeClientRegistry()
+    client = registry.api_client()
+    assert registry.core_v1().api_client is client
+    assert registry.custom_objects().api_client is client
+    assert client.configuration.host == "https://api.one.invalid:6443"
+    assert client.configuration.connection_pool_maxsize == 7
+    assert registry.stats()["config_loads"] == 1
+
+def test_client_reloads_when_kubeconfig_changes(tmp_path, monkeypatch):
+    """A rewritten kubeconfig (e.g. a new oc login) should produce a new client"""
+    kubeconfig = tmp_path / "config"
+    _write_kubeconfig(kubeconfig, "https://api.one.invalid:6443")
+    monkeypatch.setenv("KUBECONFIG", str(kubeconfig))
+    monkeypatch.setenv("KUBE_CONFIG_CHECK_INTERVAL", "0")
+    registry = KubeClientRegistry()
+    first = registry.api_client()
+    assert registry.api_client() is first
+    _write_kubeconfig(kubeconfig, "https://api.two.invalid:6443")
+    stat = os.stat(kubeconfig)
+    os.utime(kubeconfig, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = registry.api_client()
+    assert second is not first
+    assert second.configuration.host == "https://api.two.invalid:6443"
+    assert registry.stats()["config_loads"] == 2
@@ -0,0 +1,126 @@
+"""Prometheus metrics tests"""
+import sys
+import time
+import gevent
+import pytest
+sys.path.append('.')
+from firelink.metrics import PrometheusNamespaceMetrics, CombinedQueries
+
+NAMESPACES = ["ephemeral-aaaaaa", "ephemeral-bbbbbb"]
+
+def _vector(values):
+    return [{"metric": {"namespace": ns}, "value": [0, str(value)]} for ns, value in values.items()]
+
+class FakePrometheus:
+    """Answers custom_query from canned vectors keyed by query fragment"""
+    def __init__(self, responses, delay=0.0):
+        self.responses = responses
+        self.delay = delay
+        self.queries = []
+
+    def custom_query(self, query, params=None, timeout=None):
+        self.queries.append(query)
+        gevent.sleep(self.delay)
+        for fragment, response in self.responses.items():
+            if fragment in query:
+                if isinstance(response, Exception):
+                    raise response
+                if response == "hang":
+                    gevent.sleep(60)
+                return response
+        return []
+
+DEFAULT_RESPONSES = {
+    'kube_pod_resource_limit{resource="cpu"': _vector({"ephemeral-aaaaaa": 2, "ephemeral-bbbbbb": 4}),
+    'kube_pod_resource_request{resource="cpu"': _vector({"ephemeral-aaaaaa": 1}),
+    'container_cpu_usage_seconds_total': _vector({"ephemeral-aaaaaa": 0.5, "ephemeral-bbbbbb": 0.25}),
+    'kube_pod_resource_limit{resource="memory"': _vector({"ephemeral-aaaaaa": 2 * 1024**2}),
+    'kube_pod_resource_request{resource="memory"': _vector({"ephemeral-bbbbbb": 1024**2}),
+    'container_memory_working_set_bytes': _vector({"ephemeral-aaaaaa": 512 * 1024**2}),
+}
+
+@pytest.fixture(name="metrics")
+def fixture_metrics(monkeypatch):
+    """A PrometheusNamespaceMetrics talking to a fake Prometheus"""
+    monkeypatch.setenv("PROMETHEUS_QUERY_TIMEOUT", "0.5")
+    monkeypatch.setattr("firelink.metrics.get_prometheus_client", lambda: None)
+    return PrometheusNamespaceMetrics()
+
+def test_get_resources_for_namespaces(metrics):
+    """Each namespace should get its own limits, requests and usage"""
+    metrics.prometheus_api = FakePrometheus(DEFAULT_RESPONSES)
+    resources = metrics.get_resources_for_namespaces(NAMESPACES)
+    assert resources["ephemeral-aaaaaa"] == {
+        "limits": {"cpu": 2.0, "memory": 2.0},
+        "requests": {"cpu": 1.0, "memory": 0.0},
+        "usage": {"cpu": 0.5, "memory": 512.0},
+    }
+    assert resources["ephemeral-bbbbbb"] == {
+        "limits": {"cpu": 4.0, "memory": 0.0},
+        "requests": {"cpu": 0.0, "memory": 1.0},
+        "usage": {"cpu": 0.25, "memory": 0.0},
+    }
+
+def test_queries_run_concurrently(metrics):
+    """Six slow queries should take about as long as one"""
+    metrics.prometheus_api = FakePrometheus(DEFAULT_RESPONSES, delay=0.1)
+    start = time.monotonic()
+    metrics.get_resources_for_namespace("ephemeral-aaaaaa")
+    assert len(metrics.prometheus_api.queries) == 6
+    assert time.monotonic() - start < 0.3
+
+def test_partial_results_on_failure_and_timeout(metrics):
+    """A failed or hung query should be reported as missing without discarding the other results"""
+    responses = dict(DEFAULT_RESPONSES)
+    responses['kube_pod_resource_limit{resource="cpu"'] = RuntimeError("boom")
+    responses['container_memory_working_set_bytes'] = "hang"
+    metrics.prometheus_api = FakePrometheus(responses)
+    start = time.monotonic()
+    resources = metrics.get_resources_for_namespace("ephemeral-aaaaaa")
+    assert time.monotonic() - start < 2
+    assert resources["limits"]["cpu"] is None
+    assert resources["usage"]["memory"] is None
+    assert resources["requests"]["cpu"] == 1.0
+    assert resources["limits"]["memory"] == 2.0
+
+def _combined_vector(responses):
+    """Tag each canned vector the way the combined query's label_replace calls would"""
+    tags = {
+        'kube_pod_resource_limit{resource="cpu"': ("limits", "cpu"),
+        'kube_pod_resource_request{resource="cpu"': ("requests", "cpu"),
+        'container_cpu_usage_seconds_total': ("usage", "cpu"),
+        'kube_pod_resource_limit{resource="memory"': ("limits", "memory"),
+        'kube_pod_resource_request{resource="memory"': ("requests", "memory"),
+        'container_memory_working_set_bytes': ("usage", "memory"),
+    }
+    vector = []
+    for fragment, (kind, resource) in tags.items():
+        for series in responses[fragment]:
+            vector.append({"metric": {**series["metric"], "kind": kind, "resource": resource},
+                           "value": series["value"]})
+    return vector
+
+def test_combined_query_tags_every_series():
+    """The combined query should union all six queries with kind and resource labels"""
+    query = CombinedQueries().resources("ephemeral-aaaaaa")
+    assert query.count(" or ") == 5
+    for kind in ("limits", "requests", "usage"):
+        assert f'"kind", "{kind}"' in query
+    for resource in ("cpu", "memory"):
+        assert f'"resource", "{resource}"' in query
+
+def test_combined_mode_matches_six_query_mode(metrics):
+    """Demultiplexing the combined vector should give the same resources as six queries"""
+    metrics.prometheus_api = FakePrometheus(DEFAULT_RESPONSES)
+    expected = metrics.get_resources_for_namespaces(NAMESPACES)
+    metrics.prometheus_api = FakePrometheus({"label_replace": _combined_vector(DEFAULT_RESPONSES)})
+    assert metrics.get_resources_for_namespaces(NAMESPACES, combined=True) == expected
+    assert len(metrics.prometheus_api.queries) == 1
+
+def test_extract_cpu_values_converts_millicores(metrics):
+    """Millicore values should be converted to cores"""
+    values = metrics._extract_cpu_values([
+        {"metric": {"namespace": "ephemeral-aaaaaa"}, "value": [0, "250m"]},
+        {"metric": {"namespace": "ephemeral-bbbbbb"}, "value": [0, "1.5"]},
+    ])
+    assert values == {"ephemeral-aaaaaa": 0.25, "ephemeral-bbbbbb": 1.5}
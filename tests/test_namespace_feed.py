@@ -0,0 +1,133 @@
+"""Namespace feed tests"""
+import sys
+import threading
+import time
+sys.path.append('.')
+from firelink import namespace_feed
+from firelink.namespace_feed import NamespaceFeed
+
+class RecordingEmit:
+    """Collects events sent to rooms"""
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event, data, to=None, ignore_queue=False):
+        with self._lock:
+            self.sent.append((event, data, to, ignore_queue))
+
+class FakeRows:
+    """Namespace list rows that tests can change"""
+    def __init__(self, *names):
+        self.rows = {name: _row(name) for name in names}
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.rows.values())
+
+class FakeInformer:
+    """Keeps the listeners the feed registers"""
+    def __init__(self):
+        self.listeners = []
+
+    def add_namespace_listener(self, listener):
+        self.listeners.append(listener)
+
+    def add_reservation_listener(self, listener):
+        self.listeners.append(listener)
+
+def _row(name, reserved=False, requester=""):
+    return {"namespace": name, "status": "Active", "reserved": reserved, "pool_type": "default",
+        "requester": requester, "expires_in": "", "clowdapps": 0}
+
+def _changes(delta):
+    return sorted((change["op"], change["namespace"]) for change in delta["changes"])
+
+def test_refresh_publishes_adds_updates_and_removes():
+    """Only rows that changed are sent, to the feed's room and without the message queue"""
+    rows = FakeRows("ephemeral-aaaaaa", "ephemeral-bbbbbb")
+    emit = RecordingEmit()
+    feed = NamespaceFeed(rows, emit)
+    first = feed.refresh()
+    assert first["version"] == 1
+    assert _changes(first) == [("add", "ephemeral-aaaaaa"), ("add", "ephemeral-bbbbbb")]
+
+    rows.rows["ephemeral-aaaaaa"] = _row("ephemeral-aaaaaa", reserved=True, requester="tester")
+    del rows.rows["ephemeral-bbbbbb"]
+    rows.rows["ephemeral-cccccc"] = _row("ephemeral-cccccc")
+    second = feed.refresh()
+    assert second["previous_token"] == first["resume_token"]
+    assert _changes(second) == [
+        ("add", "ephemeral-cccccc"), ("remove", "ephemeral-bbbbbb"), ("update", "ephemeral-aaaaaa")]
+    assert [change["row"]["requester"] for change in second["changes"]
+        if change["namespace"] == "ephemeral-aaaaaa"] == ["tester"]
+
+    assert feed.refresh() is None
+    assert [(event, to, ignore_queue) for event, _, to, ignore_queue in emit.sent] == [
+        (NamespaceFeed.DELTA_EVENT, NamespaceFeed.ROOM, True)] * 2
+
+def test_resume_replays_missed_changes():
+    """A client that fell behind gets one delta collapsing the batches it missed"""
+    rows = FakeRows("ephemeral-aaaaaa", "ephemeral-bbbbbb")
+    feed = NamespaceFeed(rows, RecordingEmit())
+    token = feed.snapshot()["resume_token"]
+
+    rows.rows["ephemeral-cccccc"] = _row("ephemeral-cccccc")
+    feed.refresh()
+    rows.rows["ephemeral-cccccc"] = _row("ephemeral-cccccc", reserved=True)
+    rows.rows["ephemeral-aaaaaa"] = _row("ephemeral-aaaaaa", reserved=True)
+    feed.refresh()
+    del rows.rows["ephemeral-bbbbbb"]
+    feed.refresh()
+
+    delta = feed.resume(token)
+    assert delta["type"] == "delta"
+    assert delta["previous_token"] == token
+    assert delta["resume_token"] == feed.token(4)
+    assert _changes(delta) == [
+        ("add", "ephemeral-cccccc"), ("remove", "ephemeral-bbbbbb"), ("update", "ephemeral-aaaaaa")]
+    assert [change["row"]["reserved"] for change in delta["changes"] if change["op"] == "add"] == [True]
+
+    assert feed.resume(delta["resume_token"])["changes"] == []
+
+def test_resume_falls_back_to_snapshot(monkeypatch):
+    """Tokens from another process, from the future or older than the history get a snapshot"""
+    monkeypatch.setenv("NAMESPACE_FEED_HISTORY", "2")
+    rows = FakeRows("ephemeral-aaaaaa")
+    feed = NamespaceFeed(rows, RecordingEmit())
+    old_token = feed.snapshot()["resume_token"]
+    for i in range(3):
+        rows.rows[f"ephemeral-{i:06d}"] = _row(f"ephemeral-{i:06d}")
+        feed.refresh()
+
+    for token in (None, old_token, "someoneelse:4", feed.token(99), "garbage"):
+        snapshot = feed.resume(token)
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["version"] == 4
+        assert len(snapshot["namespaces"]) == 4
+    assert feed.resume(feed.token(2))["type"] == "delta"
+
+def test_notifications_are_debounced(monkeypatch):
+    """A burst of informer notifications is diffed and sent as one batch"""
+    monkeypatch.setenv("NAMESPACE_FEED_DEBOUNCE", "0.2")
+    informer = FakeInformer()
+    monkeypatch.setattr(namespace_feed, "get_namespace_informer", lambda: informer)
+    rows = FakeRows()
+    emit = RecordingEmit()
+    feed = NamespaceFeed(rows, emit)
+    feed.start()
+    assert len(informer.listeners) == 2
+
+    for i in range(5):
+        rows.rows[f"ephemeral-{i:06d}"] = _row(f"ephemeral-{i:06d}")
+        informer.listeners[i % 2]()
+        time.sleep(0.01)
+
+    deadline = time.monotonic() + 5
+    while not emit.sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.3)
+    assert len(emit.sent) == 1
+    assert len(emit.sent[0][1]["changes"]) == 5
+    assert rows.calls == 1
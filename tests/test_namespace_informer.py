@@ -0,0 +1,268 @@
+"""Namespace informer tests"""
+import sys
+import json
+import pytest
+from kubernetes.client.rest import ApiException
+sys.path.append('.')
+from firelink import namespace_informer, openshift_resources
+from firelink.openshift_resources import EphemeralResources, Namespace
+from firelink.namespace_informer import NamespaceInformer, index_reservations_by_namespace
+
+class FakeWatchResponse:
+    """Stand-in for a streaming urllib3 response"""
+    def __init__(self, events):
+        self.events = events
+
+    def stream(self, amt=None, decode_content=False):
+        for event in self.events:
+            yield (json.dumps(event) + "\n").encode("utf-8")
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+def _namespace(name, resource_version="1", phase="Active", labels=None):
+    return {
+        "apiVersion": "v1",
+        "kind": "Namespace",
+        "metadata": {
+            "name": name,
+            "resourceVersion": resource_version,
+            "labels": {"operator-ns": "true", "pool": "default"} if labels is None else labels,
+        },
+        "status": {"phase": phase},
+    }
+
+def _reservation(name, namespace, resource_version="1"):
+    return {
+        "metadata": {"name": name, "resourceVersion": resource_version, "labels": {"requester": "tester"}},
+        "spec": {"pool": "default"},
+        "status": {"namespace": namespace, "expiration": "2030-01-01T00:00:00Z"},
+    }
+
+class FakeListResponse:
+    """Stand-in for a list response read with _preload_content=False"""
+    def __init__(self, body):
+        self.data = json.dumps(body).encode("utf-8")
+
+    def release_conn(self):
+        pass
+
+class FakeEphemeralResources(EphemeralResources):
+    """EphemeralResources backed by canned list and watch responses"""
+    # pylint: disable=super-init-not-called
+    def __init__(self, namespaces, reservations, namespace_events=None, reservation_events=None, page_size=500):
+        self.namespaces = namespaces
+        self.reservations = reservations
+        self.namespace_events = namespace_events or []
+        self.reservation_events = reservation_events or []
+        self.namespace_page_size = page_size
+        self.namespace_calls = []
+        self.k8s_client = self
+        self.crd_client = self
+
+    def list_reservations(self, **kwargs):
+        return {"metadata": {"resourceVersion": "20"}, "items": self.reservations}
+
+    def list_namespace(self, **kwargs):
+        """Fake paginated namespace list and namespace watch"""
+        self.namespace_calls.append(kwargs)
+        if kwargs.get("watch"):
+            return FakeWatchResponse(self.namespace_events)
+        start = int(kwargs.get("_continue") or 0)
+        end = start + kwargs["limit"]
+        metadata = {"resourceVersion": "10"}
+        if end < len(self.namespaces):
+            metadata["continue"] = str(end)
+        return FakeListResponse({"metadata": metadata, "items": self.namespaces[start:end]})
+
+    def list_cluster_custom_object(self, group, version, plural, **kwargs):
+        """Fake reservation watch"""
+        return FakeWatchResponse(self.reservation_events)
+
+def test_informer_initial_list_filters_namespaces():
+    """Only active ephemeral pool namespaces should be indexed"""
+    resources = FakeEphemeralResources([
+        _namespace("ephemeral-aaaaaa"),
+        _namespace("ephemeral-base"),
+        _namespace("ephemeral-bbbbbb", phase="Terminating"),
+        _namespace("ephemeral-cccccc", labels={}),
+        _namespace("openshift-monitoring"),
+    ], [_reservation("res-1", "ephemeral-aaaaaa")])
+    informer = NamespaceInformer(lambda: resources)
+    assert informer._list_namespaces() == "10"
+    assert informer._list_reservations() == "20"
+    assert informer.synced()
+    assert [ns.name for ns in informer.namespaces()] == ["ephemeral-aaaaaa"]
+    assert informer.get_reservation_for_namespace("ephemeral-aaaaaa")["metadata"]["name"] == "res-1"
+    assert informer.get_reservation_for_namespace("ephemeral-bbbbbb") is None
+
+def test_informer_applies_watch_events():
+    """Watch events should update the index and advance the resourceVersion"""
+    resources = FakeEphemeralResources(
+        [_namespace("ephemeral-aaaaaa")],
+        [_reservation("res-1", "ephemeral-aaaaaa")],
+        namespace_events=[
+            {"type": "ADDED", "object": _namespace("ephemeral-bbbbbb", "11")},
+            {"type": "MODIFIED", "object": _namespace("ephemeral-aaaaaa", "12", phase="Terminating")},
+        ],
+        reservation_events=[
+            {"type": "DELETED", "object": _reservation("res-1", "ephemeral-aaaaaa", "21")},
+            {"type": "ADDED", "object": _reservation("res-2", "ephemeral-bbbbbb", "22")},
+        ])
+    informer = NamespaceInformer(lambda: resources)
+    informer._list_namespaces()
+    informer._list_reservations()
+    assert informer._watch_namespaces("10") == "12"
+    assert informer._watch_reservations("20") == "22"
+    assert [ns.name for ns in informer.namespaces()] == ["ephemeral-bbbbbb"]
+    assert [res["metadata"]["name"] for res in informer.reservations()] == ["res-2"]
+
+def test_informer_notifies_namespace_listeners():
+    """Namespace listeners are called after the initial list and after each namespace watch event"""
+    resources = FakeEphemeralResources(
+        [_namespace("ephemeral-aaaaaa")], [],
+        namespace_events=[
+            {"type": "ADDED", "object": _namespace("ephemeral-bbbbbb", "11")},
+            {"type": "DELETED", "object": _namespace("ephemeral-aaaaaa", "12")},
+        ])
+    informer = NamespaceInformer(lambda: resources)
+    calls = []
+    informer.add_namespace_listener(lambda: calls.append([ns.name for ns in informer.namespaces()]))
+    informer._list_namespaces()
+    informer._watch_namespaces("10")
+    assert calls == [["ephemeral-aaaaaa"], ["ephemeral-aaaaaa", "ephemeral-bbbbbb"], ["ephemeral-bbbbbb"]]
+
+GONE = {"type": "ERROR", "object": {
+    "kind": "Status", "status": "Failure", "reason": "Expired", "message": "too old resource version", "code": 410}}
+
+class StopInformer(BaseException):
+    """Ends an informer loop from a test"""
+
+def _stop_on_second_watch(resources, name):
+    """Make the resources' watch function raise StopInformer the second time it is called"""
+    watch = getattr(resources, name)
+    calls = []
+    def second_watch_stops(*args, **kwargs):
+        if kwargs.get("watch"):
+            calls.append(kwargs.get("resource_version"))
+            if len(calls) > 1:
+                raise StopInformer()
+        return watch(*args, **kwargs)
+    setattr(resources, name, second_watch_stops)
+    return calls
+
+def test_watch_gone_raises_api_exception():
+    """A 410 ERROR event should raise ApiException(410) from both watches"""
+    resources = FakeEphemeralResources([], [], namespace_events=[GONE], reservation_events=[GONE])
+    informer = NamespaceInformer(lambda: resources)
+    for watch in (informer._watch_namespaces, informer._watch_reservations):
+        with pytest.raises(ApiException) as error:
+            watch("10")
+        assert error.value.status == 410
+
+@pytest.mark.parametrize("run, watch_function", [
+    ("_run_namespaces", "list_namespace"),
+    ("_run_reservations", "list_cluster_custom_object"),
+])
+def test_watch_gone_relists_without_waiting(monkeypatch, run, watch_function):
+    """After a 410 the loop should relist straight away and watch from the new resourceVersion"""
+    resources = FakeEphemeralResources(
+        [_namespace("ephemeral-aaaaaa")], [_reservation("res-1", "ephemeral-aaaaaa")],
+        namespace_events=[GONE], reservation_events=[GONE])
+    watches = _stop_on_second_watch(resources, watch_function)
+    def no_waiting(seconds):
+        raise AssertionError("the loop waited before relisting")
+    monkeypatch.setattr(namespace_informer.time, "sleep", no_waiting)
+    informer = NamespaceInformer(lambda: resources)
+    listeners = []
+    informer.add_namespace_listener(lambda: listeners.append("namespace"))
+    informer.add_reservation_listener(lambda: listeners.append("reservation"))
+    with pytest.raises(StopInformer):
+        getattr(informer, run)()
+    # Listed, watched into the 410, relisted and watched again
+    assert len(watches) == 2
+    assert len(listeners) == 2
+
+def test_relist_after_failure_uses_new_clients(monkeypatch):
+    """After a failure the loop should relist and watch with resources built from the current clients"""
+    stale = FakeEphemeralResources([_namespace("ephemeral-aaaaaa")], [])
+    def expired_login(**kwargs):
+        raise RuntimeError("Unauthorized")
+    stale.list_namespace = expired_login
+    fresh = FakeEphemeralResources([_namespace("ephemeral-bbbbbb")], [], namespace_events=[
+        {"type": "ADDED", "object": _namespace("ephemeral-cccccc", "11")}])
+    built = [stale, fresh, fresh]
+    def resources_factory():
+        if not built:
+            raise StopInformer()
+        return built.pop(0)
+    retries = []
+    def retry_wait(seconds):
+        retries.append(seconds)
+        if len(retries) > 1:
+            raise AssertionError("the loop kept failing with the stale clients")
+    monkeypatch.setattr(namespace_informer.time, "sleep", retry_wait)
+    informer = NamespaceInformer(resources_factory)
+    with pytest.raises(StopInformer):
+        informer._run_namespaces()
+    assert [call.get("watch") for call in fresh.namespace_calls] == [None, True]
+    assert sorted(ns.name for ns in informer.namespaces()) == ["ephemeral-bbbbbb", "ephemeral-cccccc"]
+
+def test_list_namespaces_filters_server_side_and_paginates():
+    """Namespaces should be listed in pages with the selectors pushed to the API server"""
+    names = [f"ephemeral-{i:06d}" for i in range(5)]
+    resources = FakeEphemeralResources([_namespace(name) for name in names], [], page_size=2)
+    records, resource_version = resources.list_namespaces()
+    assert [record.name for record in records] == names
+    assert records[0].labels["pool"] == "default"
+    assert resource_version == "10"
+    assert [call["_continue"] for call in resources.namespace_calls] == [None, "2", "4"]
+    for call in resources.namespace_calls:
+        assert call["label_selector"] == "operator-ns"
+        assert call["field_selector"] == "status.phase=Active"
+        assert call["_preload_content"] is False
+
+def test_index_reservations_by_namespace_skips_pending():
+    """Pending reservations have no namespace yet and must not be indexed"""
+    pending = {"metadata": {"name": "res-pending"}, "status": {"state": "waiting"}}
+    index = index_reservations_by_namespace([_reservation("res-1", "ephemeral-aaaaaa"), pending])
+    assert list(index) == ["ephemeral-aaaaaa"]
+
+def test_namespace_list_order_does_not_depend_on_event_order(monkeypatch):
+    """Informers that saw the same namespaces in a different order should list them identically"""
+    names = ["ephemeral-cccccc", "ephemeral-aaaaaa", "ephemeral-bbbbbb"]
+    lists = []
+    for order in (names, list(reversed(names))):
+        resources = FakeEphemeralResources([], [], namespace_events=[
+            {"type": "ADDED", "object": _namespace(name, str(i))} for i, name in enumerate(order)])
+        informer = NamespaceInformer(lambda resources=resources: resources)
+        informer._list_namespaces()
+        informer._list_reservations()
+        informer._watch_namespaces("10")
+        monkeypatch.setattr(openshift_resources, "get_namespace_informer", lambda informer=informer: informer)
+        lists.append(Namespace(json.dumps).list())
+    assert lists[0] == lists[1]
+    assert [row["namespace"] for row in json.loads(lists[0])] == sorted(names)
+
+def test_describe_falls_back_to_bonfire_for_unindexed_namespaces(monkeypatch):
+    """A namespace missing from a synced informer should still be described by bonfire"""
+    resources = FakeEphemeralResources([_namespace("ephemeral-aaaaaa")], [])
+    informer = NamespaceInformer(lambda: resources)
+    informer._list_namespaces()
+    informer._list_reservations()
+    monkeypatch.setattr(openshift_resources, "get_namespace_informer", lambda: informer)
+    described = []
+    def describe_namespace(namespace, output):
+        described.append(namespace)
+        return "Current project: ephemeral-bbbbbb"
+    monkeypatch.setattr(openshift_resources.bonfire, "describe_namespace", describe_namespace)
+    namespace = Namespace()
+    def route_guard():
+        raise AssertionError("the synced informer already showed the reservation system is available")
+    monkeypatch.setattr(namespace.helpers, "route_guard", route_guard)
+    response = namespace.describe("ephemeral-bbbbbb")
+    assert described == ["ephemeral-bbbbbb"]
+    assert response == {"completed": True, "message": {"current_project": "ephemeral-bbbbbb"}}
@@ -0,0 +1,57 @@
+"""Parallel apply tests"""
+import sys
+import pytest
+sys.path.append('.')
+from firelink import apps as apps_module
+from firelink.apps import Apps
+from firelink.apply_index import ApplyIndex
+
+def _item(kind, name):
+    return {"apiVersion": "v1", "kind": kind, "metadata": {"name": name}}
+
+ITEMS = [
+    _item("ClowdApp", "rbac"),
+    _item("Frontend", "rbac-ui"),
+    _item("ConfigMap", "rbac-settings"),
+    _item("ClowdJobInvocation", "rbac-smoke"),
+    _item("Secret", "rbac-creds"),
+    _item("ClowdApp", "host-inventory"),
+]
+
+@pytest.fixture(name="deployer")
+def fixture_deployer(monkeypatch):
+    """Apps instance with stubbed templates and apply, recording applies and events"""
+    index = ApplyIndex()
+    monkeypatch.setattr(index, "live_fingerprints", lambda ns, items: {})
+    monkeypatch.setattr(apps_module, "get_apply_index", lambda: index)
+    events = []
+    apps = Apps(emit=lambda event, data: events.append(data))
+    monkeypatch.setattr(apps, "_render_templates", lambda request: {"kind": "List", "items": list(ITEMS)})
+    apps.events = events
+    apps.index = index
+    return apps
+
+def test_items_are_applied_in_stages(monkeypatch, deployer):
+    """Config should be applied before ClowdApps, and ClowdApps before frontends and jobs"""
+    applied = []
+    monkeypatch.setattr(apps_module.bonfire, "apply_config",
+        lambda ns, config: applied.append(config["items"][0]["kind"]))
+    deployer._process_apps({"clowd_env": "env-ephemeral-aaaaaa", "parallel_apply": True}, "ephemeral-aaaaaa", False)
+    assert sorted(applied[:2]) == ["ConfigMap", "Secret"]
+    assert applied[2:4] == ["ClowdApp", "ClowdApp"]
+    assert sorted(applied[4:]) == ["ClowdJobInvocation", "Frontend"]
+    progress = [event for event in deployer.events if "total" in event]
+    assert [event["applied"] for event in progress] == [1, 2, 3, 4, 5, 6]
+
+def test_failed_stage_stops_the_apply(monkeypatch, deployer):
+    """A failing item should fail the deploy before later stages run, keeping what was applied"""
+    applied = []
+    def apply_config(ns, config):
+        item = config["items"][0]
+        if item["metadata"]["name"] == "rbac":
+            raise RuntimeError("oc apply failed")
+        applied.append(item["kind"])
+    monkeypatch.setattr(apps_module.bonfire, "apply_config", apply_config)
+    with pytest.raises(RuntimeError):
+        deployer._process_apps({"clowd_env": "env-ephemeral-aaaaaa", "parallel_apply": True}, "ephemeral-aaaaaa", False)
+    assert "Frontend" not in applied
@@ -0,0 +1,48 @@
+"""Shared Prometheus client tests"""
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+sys.path.append('.')
+from firelink.prometheus_client import PrometheusClientFactory
+
+class FakePrometheusHandler(BaseHTTPRequestHandler):
+    """Answers every query with an empty vector over a keep-alive connection"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"status": "success", "data": {"resultType": "vector", "result": []}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(name="prometheus_url")
+def fixture_prometheus_url():
+    """URL of a local fake Prometheus"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePrometheusHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def test_client_is_shared_and_reuses_connections(monkeypatch, prometheus_url):
+    """Repeated queries should go through one client and one kept-alive connection"""
+    monkeypatch.setenv("PROMETHEUS_URL", prometheus_url)
+    monkeypatch.setenv("PROMETHEUS_POOL_SIZE", "4")
+    factory = PrometheusClientFactory()
+    client = factory.client()
+    assert factory.client() is client
+    for _ in range(5):
+        assert client.custom_query(query="up") == []
+    stats = factory.stats()
+    assert stats["pool_size"] == 4
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
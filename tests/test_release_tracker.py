@@ -0,0 +1,97 @@
+"""Release tracker tests"""
+import sys
+import threading
+import pytest
+sys.path.append('.')
+from firelink import release_tracker, openshift_resources
+from firelink.openshift_resources import Namespace
+from firelink.release_tracker import ReleaseTracker, ReleaseHandle
+
+class FakeInformer:
+    """Synced informer whose reservations are removed by the test"""
+    def __init__(self, namespaces):
+        self.reserved = set(namespaces)
+        self.listeners = []
+
+    def synced(self):
+        return True
+
+    def get_reservation_for_namespace(self, name):
+        return {"status": {"namespace": name}} if name in self.reserved else None
+
+    def add_reservation_listener(self, listener):
+        self.listeners.append(listener)
+
+    def delete_reservation(self, name):
+        """Simulate the watch seeing a reservation go away"""
+        self.reserved.discard(name)
+        for listener in self.listeners:
+            listener()
+
+class Completions:
+    """Collects settled releases"""
+    def __init__(self):
+        self.handles = []
+        self.done = threading.Event()
+
+    def __call__(self, handle):
+        self.handles.append(handle)
+        self.done.set()
+
+@pytest.fixture(name="completions")
+def fixture_completions():
+    """Callback recording settled releases"""
+    return Completions()
+
+def test_watch_confirms_release(monkeypatch, completions):
+    """A synced informer should confirm the release when the reservation is deleted"""
+    informer = FakeInformer(["ephemeral-aaaaaa"])
+    monkeypatch.setattr(release_tracker, "get_namespace_informer", lambda: informer)
+    tracker = ReleaseTracker(completions)
+    handle = tracker.track("ephemeral-aaaaaa")
+    assert tracker.get(handle.id).status == ReleaseHandle.PENDING
+    for _ in range(100):
+        if informer.listeners:
+            break
+        threading.Event().wait(0.01)
+    informer.delete_reservation("ephemeral-aaaaaa")
+    assert completions.done.wait(5)
+    assert handle.to_dict()["completed"] is True
+    assert handle.method == "watch"
+
+def test_watch_times_out(monkeypatch, completions):
+    """A reservation that never goes away should be reported as timed out"""
+    monkeypatch.setenv("RELEASE_CONFIRM_TIMEOUT", "0.1")
+    monkeypatch.setattr(release_tracker, "get_namespace_informer", lambda: FakeInformer(["ephemeral-aaaaaa"]))
+    handle = ReleaseTracker(completions).track("ephemeral-aaaaaa")
+    assert completions.done.wait(5)
+    assert handle.status == ReleaseHandle.TIMED_OUT
+
+def test_polling_backs_off_until_released(monkeypatch, completions):
+    """Without an informer the reservation should be polled with growing waits"""
+    monkeypatch.setenv("RELEASE_POLL_INITIAL_SECONDS", "0.01")
+    monkeypatch.setattr(release_tracker, "get_namespace_informer", lambda: None)
+    answers = [{"metadata": {"name": "res-1"}}] * 3 + [None]
+    sleeps = []
+    monkeypatch.setattr(release_tracker.bonfire, "get_reservation", lambda name, namespace, requester: answers.pop(0))
+    monkeypatch.setattr(release_tracker.time, "sleep", sleeps.append)
+    handle = ReleaseTracker(completions).track("ephemeral-aaaaaa")
+    assert completions.done.wait(5)
+    assert handle.status == ReleaseHandle.RELEASED
+    assert handle.method == "poll"
+    assert sleeps == [0.01, 0.02, 0.04]
+
+def test_release_answers_pending(monkeypatch, completions):
+    """A release should not claim to be completed before the tracker confirms it"""
+    monkeypatch.setenv("RELEASE_CONFIRM_TIMEOUT", "5")
+    informer = FakeInformer(["ephemeral-aaaaaa"])
+    monkeypatch.setattr(release_tracker, "get_namespace_informer", lambda: informer)
+    tracker = ReleaseTracker(completions)
+    monkeypatch.setattr(openshift_resources, "get_release_tracker", lambda: tracker)
+    monkeypatch.setattr(openshift_resources.bonfire, "release_reservation", lambda name, namespace, local: None)
+    namespace = Namespace()
+    monkeypatch.setattr(namespace.helpers, "route_guard", lambda: None)
+    response = namespace.release({"namespace": "ephemeral-aaaaaa"})
+    assert response["completed"] is False
+    assert response["status"] == ReleaseHandle.PENDING
+    assert tracker.get(response["release_id"]).namespace == "ephemeral-aaaaaa"
@@ -0,0 +1,174 @@
+"""Response cache tests"""
+import sys
+import pytest
+from flask import Flask, request
+from flask_caching import Cache
+sys.path.append('.')
+from firelink.response_cache import ResponseCache
+from firelink.cache_backends import FlaskCacheBackend, InMemoryCacheBackend
+
+def _make_client(backend=None, threshold=500):
+    """A small app with cached list and POST endpoints plus a mutating endpoint"""
+    app = Flask(__name__)
+    if backend is None:
+        backend = FlaskCacheBackend(Cache(app, config={'CACHE_TYPE': 'simple', 'CACHE_THRESHOLD': threshold}))
+    response_cache = ResponseCache(backend)
+    calls = {"list": 0, "top_pods": 0, "nodes": 0}
+
+    @app.route("/list")
+    @response_cache.cached("namespace_list", groups=[ResponseCache.NAMESPACES_GROUP])
+    def namespace_list():
+        calls["list"] += 1
+        return [{"namespace": "ephemeral-aaaaaa", "calls": calls["list"]}]
+
+    @app.route("/top_pods", methods=["POST"])
+    @response_cache.cached("namespace_top_pods", groups=[ResponseCache.NAMESPACES_GROUP])
+    def top_pods():
+        calls["top_pods"] += 1
+        return {"namespace": request.json["namespace"]}
+
+    @app.route("/nodes")
+    @response_cache.cached("cluster_top_nodes", etag=True)
+    def nodes():
+        calls["nodes"] += 1
+        return [{"node": "node-01", "generation": calls["nodes"] // 3}]
+
+    @app.route("/failing")
+    @response_cache.cached("cluster_cpu_usage")
+    def failing():
+        return ("", 500)
+
+    @app.route("/reserve", methods=["POST"])
+    def reserve():
+        response_cache.invalidate(ResponseCache.NAMESPACES_GROUP)
+        return {"completed": True}
+
+    client = app.test_client()
+    client.calls = calls
+    client.response_cache = response_cache
+    return client
+
+@pytest.fixture(name="client")
+def fixture_client():
+    """Client for an app using the per-process cache tier"""
+    return _make_client()
+
+def test_repeated_get_is_served_from_cache(client):
+    """A second identical GET should not call the view"""
+    first = client.get("/list")
+    second = client.get("/list")
+    assert first.get_json() == second.get_json()
+    assert client.calls["list"] == 1
+    assert client.response_cache.stats() == {"backend": "local", "hits": 1, "misses": 1, "errors": 0}
+
+def test_query_string_and_body_are_part_of_the_key(client):
+    """Different parameters and POST bodies should get their own entries"""
+    client.get("/list")
+    client.get("/list?combined=true")
+    assert client.calls["list"] == 2
+    client.post("/top_pods", json={"namespace": "ephemeral-aaaaaa"})
+    response = client.post("/top_pods", json={"namespace": "ephemeral-bbbbbb"})
+    assert response.get_json() == {"namespace": "ephemeral-bbbbbb"}
+    client.post("/top_pods", json={"namespace": "ephemeral-aaaaaa"})
+    assert client.calls["top_pods"] == 2
+
+def test_invalidating_a_group_drops_its_entries(client):
+    """A mutating endpoint should force the next read to be recomputed"""
+    client.get("/list")
+    client.post("/reserve")
+    response = client.get("/list")
+    assert response.get_json()[0]["calls"] == 2
+
+def test_invalidation_survives_local_cache_pruning():
+    """Pruning a full per-process cache should not bring back entries from before an invalidation"""
+    client = _make_client(threshold=3)
+    client.get("/list")
+    client.post("/reserve")
+    assert client.get("/list").get_json()[0]["calls"] == 2
+    # Enough new entries to go over the threshold and prune the oldest ones
+    for namespace in ("ephemeral-aaaaaa", "ephemeral-bbbbbb"):
+        client.post("/top_pods", json={"namespace": namespace})
+    assert client.get("/list").get_json()[0]["calls"] >= 2
+
+def test_errors_are_not_cached(client):
+    """Only successful responses should be stored"""
+    client.get("/failing")
+    client.get("/failing")
+    assert client.response_cache.stats()["hits"] == 0
+
+def test_zero_ttl_disables_caching(client, monkeypatch):
+    """CACHE_TTL_<NAME>=0 should bypass the cache for that endpoint"""
+    monkeypatch.setenv("CACHE_TTL_NAMESPACE_LIST", "0")
+    client.get("/list")
+    client.get("/list")
+    assert client.calls["list"] == 2
+
+def test_replicas_share_the_shared_tier():
+    """A response cached by one replica should be served by another"""
+    backend = InMemoryCacheBackend()
+    first_replica = _make_client(backend)
+    second_replica = _make_client(backend)
+    first_replica.get("/list")
+    response = second_replica.get("/list")
+    assert response.get_json()[0]["calls"] == 1
+    assert second_replica.calls["list"] == 0
+    first_replica.post("/reserve")
+    second_replica.get("/list")
+    assert second_replica.calls["list"] == 1
+
+def test_large_payloads_are_compressed(monkeypatch):
+    """Payloads above the threshold should be stored compressed and round-trip intact"""
+    monkeypatch.setenv("CACHE_COMPRESS_MIN_BYTES", "64")
+    response_cache = ResponseCache(InMemoryCacheBackend())
+    entry = {"body": b"[" + b'"ephemeral-aaaaaa",' * 100 + b'""]', "status": 200, "mimetype": "application/json"}
+    data = response_cache.serialize(entry)
+    assert data[:1] == ResponseCache.COMPRESSED
+    assert len(data) < len(entry["body"])
+    assert response_cache.deserialize(data) == entry
+    small = {"body": b"[]", "status": 200, "mimetype": "application/json"}
+    assert response_cache.deserialize(response_cache.serialize(small)) == small
+
+def test_failing_backend_falls_through_to_the_view():
+    """Cache tier errors should cost the cache, not the request"""
+    class BrokenBackend:
+        name = "broken"
+        def get(self, key):
+            raise ConnectionError("redis down")
+        def set(self, key, value, timeout):
+            raise ConnectionError("redis down")
+    client = _make_client(BrokenBackend())
+    assert client.get("/list").status_code == 200
+    assert client.post("/reserve").status_code == 200
+    assert client.calls["list"] == 1
+    assert client.response_cache.stats()["errors"] > 0
+
+def test_etag_answers_not_modified(client):
+    """A client presenting the current ETag gets an empty 304, on misses and on hits alike"""
+    first = client.get("/nodes")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    cached = client.get("/nodes", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert client.calls["nodes"] == 1
+
+    assert client.get("/nodes", headers={"If-None-Match": '"stale"'}).get_json() == first.get_json()
+    assert client.get("/list").headers.get("ETag") is None
+
+def test_etag_follows_the_content(client, monkeypatch):
+    """The ETag only changes when the body does, including with caching disabled"""
+    monkeypatch.setenv("CACHE_TTL_CLUSTER_TOP_NODES", "0")
+    etags = [client.get("/nodes").headers["ETag"] for _ in range(4)]
+    assert etags[0] == etags[1]
+    assert etags[2] != etags[1]
+    assert etags[3] == etags[2]
+    assert client.get("/nodes", headers={"If-None-Match": etags[3]}).status_code == 304
+
+def test_replicas_agree_on_etags():
+    """Replicas serving the same body hand out the same ETag"""
+    first_replica = _make_client(InMemoryCacheBackend())
+    second_replica = _make_client(InMemoryCacheBackend())
+    etag = first_replica.get("/nodes").headers["ETag"]
+    assert second_replica.get("/nodes", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,54 @@
+"""Single-flight tests"""
+import sys
+import time
+import threading
+import pytest
+sys.path.append('.')
+from firelink.singleflight import SingleFlight
+
+def _run_concurrently(count, func, *args):
+    """Run func in several threads and collect the results or exceptions in order"""
+    outcomes = [None] * count
+    def run(index):
+        try:
+            outcomes[index] = func(*args)
+        except Exception as e:
+            outcomes[index] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+def test_concurrent_identical_calls_share_one_execution():
+    """Callers arriving while a call is in flight should get its result"""
+    singleflight = SingleFlight()
+    executions = []
+    def fetch(value):
+        executions.append(value)
+        time.sleep(0.1)
+        return {"value": value}
+    outcomes = _run_concurrently(5, singleflight.do, ("namespace_list",), fetch, 1)
+    assert outcomes == [{"value": 1}] * 5
+    assert executions == [1]
+    assert singleflight.stats() == {"namespace_list": {"calls": 5, "executions": 1, "coalesced": 4}}
+
+def test_different_keys_run_separately():
+    """Calls with different arguments should not be coalesced"""
+    singleflight = SingleFlight()
+    assert singleflight.do(("metrics", "a"), lambda: "a") == "a"
+    assert singleflight.do(("metrics", "b"), lambda: "b") == "b"
+    assert singleflight.stats()["metrics"]["executions"] == 2
+
+def test_errors_are_shared_and_not_remembered():
+    """Followers should see the leader's error, and the next call should run again"""
+    singleflight = SingleFlight()
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("boom")
+    outcomes = _run_concurrently(3, singleflight.do, ("apps_list",), failing)
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert singleflight.do(("apps_list",), lambda: "ok") == "ok"
+    with pytest.raises(RuntimeError):
+        singleflight.do(("apps_list",), failing)
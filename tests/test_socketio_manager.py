@@ -0,0 +1,102 @@
+"""Socket.IO message queue tests"""
+import sys
+import time
+import uuid
+import socketio
+sys.path.append('.')
+from firelink.socketio_manager import InProcessManager, create_socketio_manager
+
+class Worker:
+    """A Socket.IO server standing in for one gunicorn worker, recording the packets it sends"""
+    def __init__(self, channel):
+        self.manager = InProcessManager(channel=channel)
+        self.server = socketio.Server(async_mode="threading", client_manager=self.manager)
+        self.server.manager_initialized = True
+        self.manager.initialize()
+        self.sent = []
+        self.server._send_eio_packet = self._record
+
+    def _record(self, eio_sid, eio_packet):
+        self.sent.append((eio_sid, socketio.packet.Packet(encoded_packet=eio_packet.data).data))
+
+    def connect(self):
+        """Register a socket on this worker, returning (eio_sid, sid)"""
+        eio_sid = uuid.uuid4().hex
+        return eio_sid, self.manager.connect(eio_sid, "/")
+
+    def wait_for_packets(self, count, timeout=5):
+        """Block until this worker has sent count packets"""
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return list(self.sent)
+
+    def close(self):
+        """Stop listening on the channel"""
+        self.manager.close()
+
+def _workers(count):
+    channel = f"test-{uuid.uuid4().hex}"
+    return [Worker(channel) for _ in range(count)]
+
+def test_emit_to_socket_on_another_worker():
+    """An event addressed to a socket reaches it from a worker it isn't connected to"""
+    sender, receiver = _workers(2)
+    try:
+        eio_sid, sid = receiver.connect()
+        sender.server.emit("monitor-deploy-app", {"message": "hello"}, to=sid)
+
+        assert receiver.wait_for_packets(1) == [(eio_sid, ["monitor-deploy-app", {"message": "hello"}])]
+        assert sender.sent == []
+    finally:
+        sender.close()
+        receiver.close()
+
+def test_broadcast_reaches_every_worker_once():
+    """A broadcast is delivered once to the sockets of every worker, including the sender's"""
+    workers = _workers(3)
+    try:
+        eio_sids = [worker.connect()[0] for worker in workers]
+        workers[0].server.emit("release-namespace", {"release_id": "abc"})
+
+        for worker, eio_sid in zip(workers, eio_sids):
+            assert worker.wait_for_packets(1) == [(eio_sid, ["release-namespace", {"release_id": "abc"}])]
+        time.sleep(0.1)
+        assert all(len(worker.sent) == 1 for worker in workers)
+    finally:
+        for worker in workers:
+            worker.close()
+
+def test_channels_are_isolated():
+    """Managers on different channels don't see each other's events"""
+    sender, = _workers(1)
+    receiver, = _workers(1)
+    try:
+        receiver.connect()
+        sender.server.emit("release-namespace", {"release_id": "abc"})
+
+        time.sleep(0.1)
+        assert receiver.sent == []
+    finally:
+        sender.close()
+        receiver.close()
+
+def test_create_socketio_manager(monkeypatch):
+    """SOCKETIO_MESSAGE_QUEUE selects the manager"""
+    monkeypatch.delenv("SOCKETIO_MESSAGE_QUEUE", raising=False)
+    assert create_socketio_manager() is None
+
+    monkeypatch.setenv("SOCKETIO_MESSAGE_QUEUE", "memory")
+    monkeypatch.setenv("SOCKETIO_CHANNEL", "firelink-test")
+    manager = create_socketio_manager()
+    try:
+        assert isinstance(manager, InProcessManager)
+        assert manager.channel == "firelink-test"
+    finally:
+        manager.close()
+
+    monkeypatch.setenv("SOCKETIO_MESSAGE_QUEUE", "redis")
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    manager = create_socketio_manager()
+    assert manager.name == "redis"
+    assert manager.redis_url == "redis://localhost:6379/0"
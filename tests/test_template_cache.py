@@ -0,0 +1,55 @@
+"""Processed template cache tests"""
+import sys
+sys.path.append('.')
+from firelink.template_cache import TemplateCache
+
+def _config(name, size=1):
+    return {"kind": "List", "items": [{"kind": "ClowdApp", "metadata": {"name": name}, "data": "x" * size}]}
+
+def test_identical_requests_share_an_entry():
+    """The key should not depend on field order and hits should return independent copies"""
+    cache = TemplateCache()
+    calls = []
+    def process():
+        calls.append(1)
+        return _config("rbac")
+    first = cache.get_or_process({"app_names": ["rbac"], "clowd_env": "env-ephemeral-aaaaaa"}, process)
+    first["items"].clear()
+    second = cache.get_or_process({"clowd_env": "env-ephemeral-aaaaaa", "app_names": ["rbac"]}, process)
+    assert len(calls) == 1
+    assert second == _config("rbac")
+    cache.get_or_process({"app_names": ["rbac"], "clowd_env": "env-ephemeral-bbbbbb"}, process)
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    """Going over the entry limit should evict the least recently used config"""
+    monkeypatch.setenv("TEMPLATE_CACHE_MAX_ENTRIES", "2")
+    cache = TemplateCache()
+    cache.set("a", _config("a"))
+    cache.set("b", _config("b"))
+    cache.get("a")
+    cache.set("c", _config("c"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_memory_cap_is_respected(monkeypatch):
+    """Entries should be evicted to stay under the byte limit, and oversized ones not stored"""
+    monkeypatch.setenv("TEMPLATE_CACHE_MAX_BYTES", "2500")
+    cache = TemplateCache()
+    cache.set("a", _config("a", 1000))
+    cache.set("b", _config("b", 1000))
+    cache.set("c", _config("c", 5000))
+    assert cache.get("c") is None
+    cache.set("d", _config("d", 1000))
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= 2500
+
+def test_entries_expire(monkeypatch):
+    """Entries older than the TTL should not be served"""
+    monkeypatch.setenv("TEMPLATE_CACHE_TTL", "0.01")
+    cache = TemplateCache()
+    cache.set("a", _config("a"))
+    monkeypatch.setattr("firelink.template_cache.time.monotonic", lambda: float("inf"))
+    assert cache.get("a") is None